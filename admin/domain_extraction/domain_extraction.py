@@ -1,50 +1,56 @@
-import asyncio, time
+import time
 
 from urllib.parse import urlparse
-from urllib.robotparser import RobotFileParser
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from utils import logger
 from storage.models import KnowledgeBaseRecord
-from storage.knowledge_base import KnowledgeBase
-from domain_extraction.functions import get_sitemap_urls, crawl_site, deduplicate_downloads, build_kb_record_from_crawl
-
-async def run_domain_extraction(domain: str):
+from storage.enrichment import enrich_records
+from storage.knowledge_base import KnowledgeBase, KB_COMMIT_BATCH_SIZE
+from storage.crawl_state import CrawlState, CrawlStateStore
+from storage.url_metadata import UrlMetadataStore
+from storage.fingerprint_index import FingerprintIndex
+from web_search.functions import get_content_type
+from domain_extraction.functions import iter_sitemap_urls, CrawlScheduler, deduplicate_downloads, build_kb_record_from_crawl, revalidate_downloads
+
+async def run_domain_extraction(domain: str, resume: bool = True, incremental: bool = False):
     start_time = time.time()
     logger.info(f'Starting domain extraction for: {domain}')
     all_downloads_info = []
 
-    collected_links = get_sitemap_urls(domain)
-    collected_links = list({link_info['url']: link_info for link_info in collected_links}.values())
-    global_visited_sitemaps = {link_info['url'] for link_info in collected_links}
-    logger.info(f'Collected {len(collected_links)} sitemap URLs from {domain}')
-
-    parsed_start = urlparse(collected_links[0]['url'])
-    robots_url = f"{parsed_start.scheme}://{parsed_start.netloc}/robots.txt"
-    rp = RobotFileParser()
-    try:
-        rp.set_url(robots_url)
-        rp.read()
-    except Exception as e:
-        logger.error(f"Failed to read robots.txt for {parsed_start.netloc}: {e}")
-        return
-
-    outer_semaphore = asyncio.Semaphore(7)
-    inner_semaphore = asyncio.Semaphore(25)
-
-    async def limited_crawl(link_info):
-        async with outer_semaphore:
-            return await crawl_site(
-                start_url=link_info['url'],
-                start_lastmod=link_info.get('lastmod'),
-                rp=rp,
-                sitemap_url_set=global_visited_sitemaps,
-                semaphore=inner_semaphore
-            )
-
-    tasks = [limited_crawl(link_info) for link_info in collected_links]
-    results = await asyncio.gather(*tasks)
-    all_downloads_info = [item for sublist in results for item in sublist]
+    state_store = CrawlStateStore(domain)
+    metadata_store = UrlMetadataStore(domain)
+    state = state_store.load() if resume else None
+    if state:
+        logger.info(
+            f'Resuming crawl of {domain} from {state.updated_at}: '
+            f'{len(state.frontier)} queued, {len(state.downloads)} downloads, {len(state.processed_downloads)} processed'
+        )
+    else:
+        state = CrawlState(domain=domain)
+
+    if state.discovery_complete:
+        all_downloads_info = state.downloads
+    else:
+        scheduler = CrawlScheduler(
+            sitemap_url_set=set(),
+            state=state,
+            state_store=state_store,
+            metadata_store=metadata_store,
+            incremental=incremental
+        )
+        sitemap_links = iter_sitemap_urls(domain, metadata_store=metadata_store, incremental=incremental)
+        all_downloads_info = await scheduler.run(sitemap_links)
+        logger.info(f'Collected {scheduler.seeds_added} sitemap URLs from {domain}')
+        if incremental:
+            discovered = {d['download_url'] for d in all_downloads_info}
+            known = [url for url in metadata_store.urls_of_kind('pdf') if url not in discovered]
+            all_downloads_info += [{'download_url': url, 'hierarchy': [url], 'lastmod': None} for url in known]
+            logger.info(f'Revalidating {len(known)} known download(s) from unchanged branches')
+        state.downloads = all_downloads_info
+        state.discovery_complete = True
+        state_store.save(state)
+        metadata_store.save()
 
     elapsed = time.time() - start_time
     logger.info(f'Download link discovery completed in {int(elapsed // 60)}m {int(elapsed % 60)}s')
@@ -53,53 +59,132 @@ async def run_domain_extraction(domain: str):
     logger.info(f'Total downloads after deduplication: {len(all_downloads_info)}')
 
     kb = KnowledgeBase()
+    known_urls = set()
+    fingerprint_index = FingerprintIndex()
+    for record in kb.iter_records():
+        known_urls.add(record.url)
+        known_urls.update(record.alternate_urls or [])
+        fingerprint_index.add(record)
+    alternate_urls: Dict[str, List[str]] = {}
     knowledge_base_records: List[KnowledgeBaseRecord] = []
+    pending_urls: List[str] = []
+    saved_count = 0
+    processed = set(state.processed_downloads)
+
+    def commit_batch() -> None:
+        nonlocal saved_count
+        if knowledge_base_records:
+            enrich_records(knowledge_base_records)
+            kb.upsert_records(knowledge_base_records)
+            known_urls.update(r.url for r in knowledge_base_records)
+            saved_count += len(knowledge_base_records)
+            logger.info(f'Committed {len(knowledge_base_records)} record(s) to knowledge base.')
+        if alternate_urls:
+            kb.add_alternate_urls(alternate_urls)
+            logger.info(f'Recorded {sum(len(v) for v in alternate_urls.values())} alternate URL(s) for duplicate documents.')
+        state.processed_downloads.extend(pending_urls)
+        state_store.save(state)
+        metadata_store.save()
+        knowledge_base_records.clear()
+        pending_urls.clear()
+        alternate_urls.clear()
 
-    last_log_time = time.time()
     total = len(all_downloads_info)
+    revalidate_urls = [
+        d['download_url'] for d in all_downloads_info
+        if d['download_url'] not in processed
+        and get_content_type(d['download_url']) == 'pdf'
+        and (incremental or d['download_url'] not in known_urls)
+    ]
+    revalidations = await revalidate_downloads(revalidate_urls, metadata_store)
+    logger.info(f'Revalidated {len(revalidations)} download(s) with conditional HEAD requests.')
 
-    for idx, download in enumerate(all_downloads_info):
-        url = download.get('download_url', '')
-        path = urlparse(url).path.split('/')[-1]
-        logger.info(f'Processing [{idx+1}/{total}]: {path}')
-
-        if kb.contains_url(url):
-            logger.warning(f"Skipping: '{url}' already exists in knowledge base.")
-            continue
-
-        try:
-            record = build_kb_record_from_crawl(download)
-            if record.source_type != 'pdf':
-                logger.info(f'Skipped non-PDF: {path}')
-                continue
-
-            record_start = time.time()
-            record.run_pdf_extraction()
-
-            if not record.paragraph_clusters:
-                logger.warning(f'No content extracted from: {path}')
+    try:
+        for idx, download in enumerate(all_downloads_info):
+            url = download.get('download_url', '')
+            if url in processed:
                 continue
+            processed_ok = process_download(kb, known_urls, metadata_store, fingerprint_index, incremental, download, revalidations.get(url), idx, total, knowledge_base_records, alternate_urls)
+            if processed_ok:
+                pending_urls.append(url)
+            if len(knowledge_base_records) >= KB_COMMIT_BATCH_SIZE:
+                commit_batch()
+    finally:
+        commit_batch()
+
+    state_store.clear()
+    logger.info(f'Completed domain extraction for {domain}: {saved_count} new or updated records saved.')
+
+def process_download(
+    kb: KnowledgeBase,
+    known_urls: set,
+    metadata_store: UrlMetadataStore,
+    fingerprint_index: FingerprintIndex,
+    incremental: bool,
+    download: dict,
+    revalidation: Optional[Tuple[bool, Dict[str, Optional[str]]]],
+    idx: int,
+    total: int,
+    knowledge_base_records: List[KnowledgeBaseRecord],
+    alternate_urls: Dict[str, List[str]]
+) -> bool:
+    url = download.get('download_url', '')
+    path = urlparse(url).path.split('/')[-1]
+    logger.info(f'Processing [{idx+1}/{total}]: {path}')
+
+    existing = None
+    changed, validators = revalidation or (True, {})
+    if url in known_urls:
+        if not incremental:
+            logger.warning(f"Skipping: '{url}' already exists in knowledge base.")
+            return True
+        if not changed:
+            metadata_store.update(url, kind='pdf', **validators)
+            logger.info(f'Unchanged since last crawl: {path}')
+            return True
+        existing = kb.get_by_url(url)
+        logger.info(f'Changed since last crawl, re-extracting: {path}')
 
-            logger.info(f'Finished PDF extraction in {int(time.time() - record_start)}s: {path}')
-        except Exception as e:
-            logger.error(f"Failed to process {path}: {e}")
-            continue
-
-        if not record.title:
-            filename = urlparse(record.url).path.split('/')[-1]
-            if filename.lower().endswith('.pdf'):
-                filename = filename[:-4]
-            record.title = filename.replace('-', ' ').replace('_', ' ').strip()
-
-        if not record.snippet:
-            all_paragraphs = [cluster.text for cluster in record.paragraph_clusters]
-            if all_paragraphs:
-                record.snippet = ' '.join(all_paragraphs)[:500]
-
-        knowledge_base_records.append(record)
-
-    if knowledge_base_records:
-        kb.save_records(knowledge_base_records)
-        logger.info(f'Knowledge base saved.')
-
-    logger.info(f'Completed domain extraction for {domain}: {len(knowledge_base_records)} new records saved.')
\ No newline at end of file
+    try:
+        record = build_kb_record_from_crawl(download)
+        if existing:
+            record.record_id = existing.record_id
+            record.published_date = record.published_date or existing.published_date
+            record.date_collected = existing.date_collected
+            record.alternate_urls = existing.alternate_urls
+        if record.source_type != 'pdf':
+            logger.info(f'Skipped non-PDF: {path}')
+            return True
+
+        record_start = time.time()
+        record.run_pdf_extraction(streaming=True, fingerprint_index=fingerprint_index)
+        metadata_store.update(url, kind='pdf', **validators)
+
+        if record.duplicate_of:
+            alternate_urls.setdefault(record.duplicate_of, []).append(url)
+            known_urls.add(url)
+            return True
+
+        if not record.paragraph_clusters:
+            logger.warning(f'No content extracted from: {path}')
+            return True
+
+        logger.info(f'Finished PDF extraction in {int(time.time() - record_start)}s: {path}')
+    except Exception as e:
+        logger.error(f"Failed to process {path}: {e}")
+        return False
+
+    if not record.title:
+        filename = urlparse(record.url).path.split('/')[-1]
+        if filename.lower().endswith('.pdf'):
+            filename = filename[:-4]
+        record.title = filename.replace('-', ' ').replace('_', ' ').strip()
+
+    if not record.snippet:
+        all_paragraphs = [cluster.text for cluster in record.paragraph_clusters]
+        if all_paragraphs:
+            record.snippet = ' '.join(all_paragraphs)[:500]
+
+    fingerprint_index.add(record)
+    knowledge_base_records.append(record)
+    return True
@@ -1,23 +1,51 @@
 from web_search.functions import get_content_type
 from storage.models import KnowledgeBaseRecord
+from storage.crawl_state import CrawlState, CrawlStateStore
+from storage.url_metadata import UrlMetadata, UrlMetadataStore
 from utils import logger
+from html_parsing import extract_links
 
 import random
+import time
+import math
+import base64
+import hashlib
+import zlib
 import requests
 import xml.etree.ElementTree as ET
 import asyncio
 import aiohttp
 
-from typing import Optional, List, Any, Dict
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from typing import Optional, List, Any, Dict, Tuple, Iterator, AsyncGenerator, AsyncIterable, Iterable, Union
+from urllib.parse import urljoin, urlparse, urlunparse, quote, unquote
 from urllib.robotparser import RobotFileParser
 from tldextract import extract
 from datetime import datetime
 from aiohttp import ClientSession, ClientTimeout
 from pathlib import Path
+from collections import OrderedDict
 
 timeout = ClientTimeout(total=15)
+sitemap_timeout = ClientTimeout(total=30)
+
+SITEMAP_NS='{http://www.sitemaps.org/schemas/sitemap/0.9}'
+SITEMAP_CONCURRENCY=10
+SITEMAP_PATHS=['sitemap.xml', 'sitemap_index.xml']
+
+CRAWL_CONCURRENCY=25
+CRAWL_HOST_INITIAL_LIMIT=4
+CRAWL_HOST_MIN_LIMIT=1
+CRAWL_HOST_MAX_LIMIT=25
+CRAWL_LATENCY_TOLERANCE=2.0
+CRAWL_BACKOFF_STATUSES={429, 503}
+CRAWL_DEPTH_LIMIT=5
+CRAWL_PROGRESS_INTERVAL=30
+CRAWL_CHECKPOINT_INTERVAL=60
+ROBOTS_TTL=3600
+ROBOTS_ERROR_TTL=300
+SEEN_URL_RECENT_SIZE=50000
+SEEN_URL_INITIAL_CAPACITY=100000
+SEEN_URL_ERROR_RATE=0.001
 
 ua_path = Path(__file__).resolve().parent / 'user_agents.txt'
 try:
@@ -49,125 +77,669 @@ headers = {
     'Upgrade-Insecure-Requests': '1'
 }
 
-def get_sitemap_urls(domain: str) -> List[Dict[str, Any]]:
+def parse_sitemap_entry(elem: ET.Element) -> Optional[Dict[str, Any]]:
+    def child_text(tag: str) -> Optional[str]:
+        child=elem.find(f'{SITEMAP_NS}{tag}')
+        return child.text.strip() if child is not None and child.text else None
+
+    loc=child_text('loc')
+    if not loc:
+        return None
+    return {
+        "url":normalize_url(loc),
+        "lastmod":child_text('lastmod'),
+        "changefreq":child_text('changefreq'),
+        "priority":child_text('priority')
+    }
+
+async def stream_sitemap_entries(url: str, session: ClientSession) -> AsyncGenerator[Tuple[str, Dict[str, Any]], None]:
+    parser=ET.XMLPullParser(events=('end',))
+    decompressor=None
+    first_chunk=True
+
+    def drain() -> List[Tuple[str, Dict[str, Any]]]:
+        entries=[]
+        for _, elem in parser.read_events():
+            if elem.tag in (f'{SITEMAP_NS}url', f'{SITEMAP_NS}sitemap'):
+                entry=parse_sitemap_entry(elem)
+                if entry:
+                    entries.append((elem.tag[len(SITEMAP_NS):], entry))
+                elem.clear()
+        return entries
+
+    async with session.get(url, headers=headers, timeout=sitemap_timeout, allow_redirects=True) as resp:
+        if resp.status!=200:
+            return
+        async for chunk in resp.content.iter_chunked(1 << 16):
+            if first_chunk:
+                first_chunk=False
+                if chunk[:2]==b'\x1f\x8b':
+                    decompressor=zlib.decompressobj(16+zlib.MAX_WBITS)
+            if decompressor:
+                chunk=decompressor.decompress(chunk)
+            parser.feed(chunk)
+            for entry in drain():
+                yield entry
+    if decompressor:
+        parser.feed(decompressor.flush())
+    parser.close()
+    for entry in drain():
+        yield entry
+
+async def iter_sitemap_urls(
+      domain: str
+    , metadata_store: Optional[UrlMetadataStore]=None
+    , incremental: bool=False
+) -> AsyncGenerator[Dict[str, Any], None]:
     start_url=normalize_url(domain)
     parsed=urlparse(start_url)
     base_url=f'{parsed.scheme}://{parsed.netloc}'
-    possible_paths=['sitemap.xml', 'sitemap_index.xml']
-    collected_links=[]
-
-    def parse_sitemap(content):
-        root=ET.fromstring(content)
-        for url_tag in root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}url"):
-            loc=url_tag.find("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-            lastmod=url_tag.find("{http://www.sitemaps.org/schemas/sitemap/0.9}lastmod")
-            changefreq=url_tag.find("{http://www.sitemaps.org/schemas/sitemap/0.9}changefreq")
-            priority=url_tag.find("{http://www.sitemaps.org/schemas/sitemap/0.9}priority")
-            if loc is not None and loc.text:
-                collected_links.append({
-                    "url":normalize_url(loc.text.strip()),
-                    "lastmod":lastmod.text.strip() if lastmod is not None and lastmod.text else None,
-                    "changefreq":changefreq.text.strip() if changefreq is not None and changefreq.text else None,
-                    "priority":priority.text.strip() if priority is not None and priority.text else None
-                })
-    for path in possible_paths:
-        try:
+    semaphore=asyncio.Semaphore(SITEMAP_CONCURRENCY)
+    found_links: asyncio.Queue=asyncio.Queue()
+    seen_sitemaps=set()
+    seen_urls=set()
+    tasks=set()
+    pending=0
+    skipped_sitemaps=0
+
+    async def expand(sitemap_url: str, sitemap_lastmod: Optional[str], session: ClientSession) -> bool:
+        nonlocal skipped_sitemaps
+        found=False
+        async with semaphore:
+            try:
+                async for kind, entry in stream_sitemap_entries(sitemap_url, session):
+                    found=True
+                    url=entry['url']
+                    if kind=='sitemap' or url.endswith(('.xml', '.xml.gz')):
+                        if url in seen_sitemaps:
+                            continue
+                        if incremental and metadata_store and metadata_store.sitemap_unchanged(url, entry['lastmod']):
+                            skipped_sitemaps+=1
+                            continue
+                        seen_sitemaps.add(url)
+                        spawn(expand(url, entry['lastmod'], session))
+                    elif url not in seen_urls:
+                        seen_urls.add(url)
+                        found_links.put_nowait(entry)
+            except Exception as e:
+                logger.error(f"Failed to fetch sitemap: {sitemap_url} | {e}")
+        if found and metadata_store:
+            metadata_store.update(sitemap_url, kind='sitemap', sitemap_lastmod=sitemap_lastmod)
+        return found
+
+    async def discover_root(session: ClientSession) -> None:
+        for path in SITEMAP_PATHS:
             sitemap_url=f'{base_url}/{path}'
-            response=requests.get(sitemap_url, headers=headers, timeout=10, allow_redirects=True)
-            if response.status_code==200 and 'xml' in response.headers.get("Content-Type","").lower():
-                root=ET.fromstring(response.content)
-                for loc in root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}loc"):
-                    if loc.text:
-                        url=normalize_url(loc.text.strip())
-                        if url.endswith(".xml"):
-                            try:
-                                sub_resp=requests.get(url, headers=headers, timeout=30, allow_redirects=True)
-                                parse_sitemap(sub_resp.content)
-                            except Exception as sub_e:
-                                logger.error(f"Failed to get nested sitemap fetch: {url} | {sub_e}") 
-                        else:
-                            collected_links.append({
-                                "url":url,
-                                "lastmod":None,
-                                "changefreq":None,
-                                "priority":None
-                            })
+            seen_sitemaps.add(sitemap_url)
+            if await expand(sitemap_url, None, session):
                 break
-        except Exception as e:
-            logger.error(f"Failed to fetch sitemap: {sitemap_url} | {e}")
-    return collected_links
 
-async def fetch_html(url: str, session: ClientSession, semaphore: asyncio.Semaphore) -> Optional[str]:
-    async with semaphore:
+    async def track(coro) -> None:
+        nonlocal pending
+        try:
+            await coro
+        finally:
+            pending-=1
+            if pending==0:
+                found_links.put_nowait(None)
+
+    def spawn(coro) -> None:
+        nonlocal pending
+        pending+=1
+        task=asyncio.create_task(track(coro))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    connector=aiohttp.TCPConnector(limit=SITEMAP_CONCURRENCY)
+    async with aiohttp.ClientSession(timeout=sitemap_timeout, connector=connector) as session:
+        spawn(discover_root(session))
+        try:
+            while True:
+                entry=await found_links.get()
+                if entry is None:
+                    break
+                yield entry
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    logger.info(f'Discovered {len(seen_urls)} sitemap URLs across {len(seen_sitemaps)} sitemap(s) for {domain}')
+    if skipped_sitemaps:
+        logger.info(f'Skipped {skipped_sitemaps} unchanged nested sitemap(s) for {domain}')
+
+class HostConcurrencyController:
+    def __init__(
+          self
+        , host: str
+        , crawl_delay: Optional[float]=None
+        , initial_limit: int=CRAWL_HOST_INITIAL_LIMIT
+        , min_limit: int=CRAWL_HOST_MIN_LIMIT
+        , max_limit: int=CRAWL_HOST_MAX_LIMIT
+    ):
+        self.host=host
+        self.crawl_delay=float(crawl_delay) if crawl_delay else None
+        self.limit=float(initial_limit)
+        self.min_limit=min_limit
+        self.max_limit=max_limit
+        self.in_flight=0
+        self.condition=asyncio.Condition()
+        self.delay_lock=asyncio.Lock()
+        self.next_request_time=0.0
+        self.ewma_latency=None
+        self.baseline_latency=None
+        self.last_decrease_time=0.0
+        self.requests=0
+        self.throttled=0
+        self.timeouts=0
+        self.first_request_time=None
+
+    async def acquire(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < max(self.min_limit, int(self.limit)))
+            self.in_flight+=1
+        async with self.delay_lock:
+            wait=self.next_request_time-time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if self.crawl_delay:
+                self.next_request_time=time.monotonic()+self.crawl_delay
+        if self.first_request_time is None:
+            self.first_request_time=time.monotonic()
+
+    async def release(self, latency: float, status: Optional[int]=None, timed_out: bool=False, retry_after: Optional[float]=None) -> None:
+        async with self.condition:
+            self.in_flight-=1
+            self.requests+=1
+            if timed_out or status in CRAWL_BACKOFF_STATUSES:
+                if timed_out:
+                    self.timeouts+=1
+                else:
+                    self.throttled+=1
+                if retry_after:
+                    self.next_request_time=max(self.next_request_time, time.monotonic()+retry_after)
+                self.decrease()
+            else:
+                self.record_latency(latency)
+            self.condition.notify_all()
+
+    def record_latency(self, latency: float) -> None:
+        self.ewma_latency=latency if self.ewma_latency is None else 0.8*self.ewma_latency+0.2*latency
+        if self.baseline_latency is None or self.ewma_latency < self.baseline_latency:
+            self.baseline_latency=self.ewma_latency
+        else:
+            self.baseline_latency+=0.01*(self.ewma_latency-self.baseline_latency)
+        if self.ewma_latency > self.baseline_latency*CRAWL_LATENCY_TOLERANCE:
+            self.decrease()
+        else:
+            self.limit=min(self.max_limit, self.limit+1/self.limit)
+
+    def decrease(self) -> None:
+        now=time.monotonic()
+        if now-self.last_decrease_time < (self.ewma_latency or 1.0):
+            return
+        self.last_decrease_time=now
+        self.limit=max(self.min_limit, self.limit*0.5)
+
+    def requests_per_second(self) -> float:
+        if self.first_request_time is None:
+            return 0.0
+        elapsed=time.monotonic()-self.first_request_time
+        return self.requests/elapsed if elapsed > 0 else 0.0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+              'host':self.host
+            , 'limit':int(self.limit)
+            , 'in_flight':self.in_flight
+            , 'requests':self.requests
+            , 'throttled':self.throttled
+            , 'timeouts':self.timeouts
+            , 'ewma_latency':round(self.ewma_latency, 3) if self.ewma_latency is not None else None
+            , 'crawl_delay':self.crawl_delay
+            , 'requests_per_second':round(self.requests_per_second(), 2)
+        }
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+async def fetch_page(url: str, session: ClientSession, controller: HostConcurrencyController, request_headers: Optional[Dict[str, str]]=None) -> Dict[str, Any]:
+    page={'status':None, 'html':None, 'etag':None, 'last_modified':None}
+    await controller.acquire()
+    start=time.monotonic()
+    timed_out=False
+    retry_after=None
+    try:
+        async with session.get(url, headers={**headers, **(request_headers or {})}, timeout=timeout, allow_redirects=True) as resp:
+            page['status']=resp.status
+            page['etag']=resp.headers.get('ETag')
+            page['last_modified']=resp.headers.get('Last-Modified')
+            retry_after=parse_retry_after(resp.headers.get('Retry-After'))
+            if resp.status==200 and "text/html" in resp.headers.get("Content-Type", "").lower():
+                page['html']=await resp.text()
+    except asyncio.TimeoutError:
+        timed_out=True
+        logger.error(f"Timed out fetching URL: {url}")
+    except Exception as e:
+        logger.error(f"Failed to fetch URL: {url} | {e}")
+    finally:
+        await controller.release(
+              latency=time.monotonic()-start
+            , status=page['status']
+            , timed_out=timed_out
+            , retry_after=retry_after
+        )
+    return page
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity=capacity
+        self.error_rate=error_rate
+        self.size=max(8, math.ceil(-capacity*math.log(error_rate)/(math.log(2)**2)))
+        self.hash_count=max(1, round(self.size/capacity*math.log(2)))
+        self.bits=bytearray((self.size+7)//8)
+        self.count=0
+
+    def positions(self, item: str) -> Iterator[int]:
+        digest=hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1=int.from_bytes(digest[:8], 'big')
+        h2=int.from_bytes(digest[8:], 'big') | 1
+        for i in range(self.hash_count):
+            yield (h1+i*h2) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count+=1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+    def false_positive_rate(self) -> float:
+        return (1-math.exp(-self.hash_count*self.count/self.size))**self.hash_count
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+              'capacity':self.capacity
+            , 'error_rate':self.error_rate
+            , 'count':self.count
+            , 'bits':base64.b64encode(zlib.compress(bytes(self.bits))).decode('ascii')
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'BloomFilter':
+        bloom=cls(capacity=data['capacity'], error_rate=data['error_rate'])
+        bloom.bits=bytearray(zlib.decompress(base64.b64decode(data['bits'])))
+        bloom.count=data['count']
+        return bloom
+
+class ScalableBloomFilter:
+    def __init__(self, initial_capacity: int=SEEN_URL_INITIAL_CAPACITY, error_rate: float=SEEN_URL_ERROR_RATE, growth: int=2, tightening: float=0.5):
+        self.initial_capacity=initial_capacity
+        self.error_rate=error_rate
+        self.growth=growth
+        self.tightening=tightening
+        self.filters: List[BloomFilter]=[]
+
+    def add(self, item: str) -> None:
+        if not self.filters or self.filters[-1].count >= self.filters[-1].capacity:
+            n=len(self.filters)
+            self.filters.append(BloomFilter(
+                  capacity=self.initial_capacity*(self.growth**n)
+                , error_rate=self.error_rate*(1-self.tightening)*(self.tightening**n)
+            ))
+        self.filters[-1].add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return any(item in bloom for bloom in reversed(self.filters))
+
+    def __len__(self) -> int:
+        return sum(bloom.count for bloom in self.filters)
+
+    def false_positive_rate(self) -> float:
+        return 1-math.prod(1-bloom.false_positive_rate() for bloom in self.filters)
+
+    def memory_bytes(self) -> int:
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+              'initial_capacity':self.initial_capacity
+            , 'error_rate':self.error_rate
+            , 'growth':self.growth
+            , 'tightening':self.tightening
+            , 'filters':[bloom.to_dict() for bloom in self.filters]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ScalableBloomFilter':
+        scalable=cls(
+              initial_capacity=data['initial_capacity']
+            , error_rate=data['error_rate']
+            , growth=data['growth']
+            , tightening=data['tightening']
+        )
+        scalable.filters=[BloomFilter.from_dict(bloom) for bloom in data['filters']]
+        return scalable
+
+class SeenUrlSet:
+    def __init__(self, recent_size: int=SEEN_URL_RECENT_SIZE, bloom: Optional[ScalableBloomFilter]=None):
+        self.recent_size=recent_size
+        self.recent: OrderedDict=OrderedDict()
+        self.bloom=bloom or ScalableBloomFilter()
+
+    def add(self, url: str) -> None:
+        if url in self.recent:
+            self.recent.move_to_end(url)
+            return
+        if url not in self.bloom:
+            self.bloom.add(url)
+        self.recent[url]=None
+        if len(self.recent) > self.recent_size:
+            self.recent.popitem(last=False)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.recent or url in self.bloom
+
+    def __len__(self) -> int:
+        return len(self.bloom)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+              'urls':len(self.bloom)
+            , 'filters':len(self.bloom.filters)
+            , 'false_positive_rate':self.bloom.false_positive_rate()
+            , 'memory_bytes':self.bloom.memory_bytes()+sum(len(url) for url in self.recent)
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'bloom':self.bloom.to_dict(), 'recent':list(self.recent)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], recent_size: int=SEEN_URL_RECENT_SIZE) -> 'SeenUrlSet':
+        seen=cls(recent_size=recent_size, bloom=ScalableBloomFilter.from_dict(data['bloom']))
+        for url in data.get('recent', [])[-recent_size:]:
+            seen.recent[url]=None
+        return seen
+
+class HostRobots:
+    def __init__(self, parser: Optional[RobotFileParser], ttl: float):
+        self.parser=parser
+        self.expires_at=time.monotonic()+ttl
+        self.decisions: Dict[str, bool]={}
+        self.prefix_length=0
+        if parser:
+            entries=parser.entries+([parser.default_entry] if parser.default_entry else [])
+            self.prefix_length=max((len(line.path) for entry in entries for line in entry.rulelines), default=0)
+
+    def is_expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def can_fetch(self, url: str) -> bool:
+        if self.parser is None:
+            return True
+        parsed_url=urlparse(unquote(url))
+        path=quote(urlunparse(('', '', parsed_url.path, parsed_url.params, parsed_url.query, parsed_url.fragment))) or '/'
+        key=path[:self.prefix_length]
+        if key not in self.decisions:
+            self.decisions[key]=self.parser.can_fetch('*', url)
+        return self.decisions[key]
+
+    def crawl_delay(self) -> Optional[float]:
+        return self.parser.crawl_delay('*') if self.parser else None
+
+class RobotsCache:
+    def __init__(self, ttl: float=ROBOTS_TTL, error_ttl: float=ROBOTS_ERROR_TTL):
+        self.ttl=ttl
+        self.error_ttl=error_ttl
+        self.entries: Dict[str, HostRobots]={}
+        self.locks: Dict[str, asyncio.Lock]={}
+
+    def get_cached(self, url: str) -> Optional[HostRobots]:
+        parsed=urlparse(url)
+        entry=self.entries.get(f'{parsed.scheme}://{parsed.netloc}')
+        return entry if entry and not entry.is_expired() else None
+
+    async def get(self, url: str, session: ClientSession) -> HostRobots:
+        entry=self.get_cached(url)
+        if entry:
+            return entry
+        parsed=urlparse(url)
+        origin=f'{parsed.scheme}://{parsed.netloc}'
+        lock=self.locks.setdefault(origin, asyncio.Lock())
+        async with lock:
+            entry=self.get_cached(url)
+            if entry:
+                return entry
+            entry=await self.fetch(origin, session)
+            self.entries[origin]=entry
+            return entry
+
+    async def fetch(self, origin: str, session: ClientSession) -> HostRobots:
+        parser=RobotFileParser(f'{origin}/robots.txt')
         try:
-            async with session.get(url, headers=headers, timeout=timeout, allow_redirects=True) as resp:
-                if resp.status==200 and "text/html" in resp.headers.get("Content-Type", "").lower():
-                    return await resp.text()
+            async with session.get(f'{origin}/robots.txt', headers=headers, timeout=timeout, allow_redirects=True) as resp:
+                if resp.status in (401, 403):
+                    parser.disallow_all=True
+                elif resp.status >= 400:
+                    parser.allow_all=True
                 else:
-                    return None
+                    parser.parse((await resp.text(errors='replace')).splitlines())
+            return HostRobots(parser, self.ttl)
         except Exception as e:
-            logger.error(f"Failed to fetch URL: {url} | {e}")
-            return None
+            logger.warning(f"Failed to read robots.txt for {origin}, allowing all for now: {e}")
+            return HostRobots(None, self.error_ttl)
+
+    def can_fetch(self, url: str) -> bool:
+        entry=self.get_cached(url)
+        return entry.can_fetch(url) if entry else True
+
+class CrawlScheduler:
+    def __init__(
+          self
+        , sitemap_url_set: set
+        , robots: Optional[RobotsCache]=None
+        , concurrency: int=CRAWL_CONCURRENCY
+        , depth_limit: int=CRAWL_DEPTH_LIMIT
+        , state: Optional[CrawlState]=None
+        , state_store: Optional[CrawlStateStore]=None
+        , metadata_store: Optional[UrlMetadataStore]=None
+        , incremental: bool=False
+    ):
+        self.robots=robots or RobotsCache()
+        self.sitemap_url_set=sitemap_url_set
+        self.concurrency=concurrency
+        self.depth_limit=depth_limit
+        self.download_extensions=('.pdf')
+        self.frontier: asyncio.Queue=asyncio.Queue()
+        self.visited=SeenUrlSet.from_dict(state.seen_urls) if state and state.seen_urls else SeenUrlSet()
+        self.downloads_info=list(state.downloads) if state else []
+        self.pending: Dict[str, Dict[str, Any]]={}
+        self.state=state
+        self.state_store=state_store
+        self.last_checkpoint_time=None
+        self.metadata_store=metadata_store
+        self.incremental=incremental and metadata_store is not None
+        self.pages_not_modified=0
+        self.seeds_added=0
+        self.seeds_skipped=0
+        self.host_controllers: Dict[str, HostConcurrencyController]={}
+        self.pages_fetched=0
+        self.start_time=None
+        self.last_log_time=None
+
+    async def get_host_controller(self, url: str, session: ClientSession) -> HostConcurrencyController:
+        host=urlparse(url).netloc
+        if host not in self.host_controllers:
+            robots=await self.robots.get(url, session)
+            if host not in self.host_controllers:
+                self.host_controllers[host]=HostConcurrencyController(host=host, crawl_delay=robots.crawl_delay())
+        return self.host_controllers[host]
+
+    def host_metrics(self) -> List[Dict[str, Any]]:
+        return [controller.metrics() for controller in self.host_controllers.values()]
+
+    def enqueue(self, url: str, hierarchy: List[str], lastmod: Optional[str], seed_url: str) -> None:
+        if url in self.visited or url in self.pending:
+            return
+        self.pending[url]={'url':url, 'hierarchy':hierarchy, 'lastmod':lastmod, 'seed_url':seed_url}
+        self.frontier.put_nowait((url, hierarchy, lastmod, seed_url))
+
+    def checkpoint(self, force: bool=False) -> None:
+        if not self.state_store or not self.state:
+            return
+        now=time.perf_counter()
+        if not force and self.last_checkpoint_time and now-self.last_checkpoint_time < CRAWL_CHECKPOINT_INTERVAL:
+            return
+        self.last_checkpoint_time=now
+        self.state.seen_urls=self.visited.to_dict()
+        self.state.frontier=list(self.pending.values())
+        self.state.downloads=list(self.downloads_info)
+        try:
+            self.state_store.save(self.state)
+            if self.metadata_store:
+                self.metadata_store.save()
+        except Exception as e:
+            logger.error(f'Failed to checkpoint crawl state: {e}')
 
-async def crawl_site(start_url: str, start_lastmod: str, rp: RobotFileParser, sitemap_url_set: set, semaphore: asyncio.Semaphore) -> List:
-    downloads_info=[]
-    visited=set()
-    to_visit=[(start_url, [start_url], start_lastmod)]
-    start_domain_parts=extract(start_url)
-    start_registered_domain=f"{start_domain_parts.domain}.{start_domain_parts.suffix}"
-    download_extensions=('.pdf')
-    depth_limit=5
-
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        async def process_url(current_url, hierarchy, lastmod):
-            if current_url in visited:
-                return
-            visited.add(current_url)
-            if len(hierarchy) > depth_limit:
-                return
-            html=await fetch_html(current_url, session, semaphore)
-            if not html:
-                return
-            soup=BeautifulSoup(html, 'html.parser')
-            for a_tag in soup.find_all('a', href=True):
-                raw_href=a_tag['href']
-                full_url=urljoin(current_url, raw_href)
-                if not full_url.startswith(('https://', 'https://')):
-                    continue
-                normalized_url=normalize_url(full_url)
-                if not normalized_url:
-                    continue
-                if normalized_url.lower().endswith(download_extensions):
-                    if rp is None or rp.can_fetch('*', normalized_url):
-                        downloads_info.append({
-                            "download_url":normalized_url,
-                            "hierarchy":hierarchy.copy(),
-                            "lastmod":lastmod
-                        })
-                    continue
-                if rp and not rp.can_fetch('*', normalized_url):
-                    continue
-                target_domain_parts=extract(normalized_url)
-                target_registered_domain=f"{target_domain_parts.domain}.{target_domain_parts.suffix}"
-                if target_registered_domain != start_registered_domain:
-                    continue
-                if urlparse(normalized_url).netloc == urlparse(start_url).netloc:
-                    continue
-                if normalized_url in visited:
-                    continue
-                if normalized_url in sitemap_url_set:
-                    continue
-                to_visit.append((normalized_url, hierarchy+[normalized_url], lastmod))
-        while to_visit:
-            batch=[]
-            while to_visit and len(batch) < 10:
-                batch.append(to_visit.pop())
-            tasks=[
-                process_url(current_url, hierarchy, lastmod) 
-                for current_url, hierarchy, lastmod in batch
-            ]
-            await asyncio.gather(*tasks)
-    return downloads_info
+    def pages_per_second(self) -> float:
+        if not self.start_time:
+            return 0.0
+        elapsed=time.perf_counter()-self.start_time
+        return self.pages_fetched/elapsed if elapsed > 0 else 0.0
+
+    def log_progress(self, force: bool=False) -> None:
+        now=time.perf_counter()
+        if not force and self.last_log_time and now-self.last_log_time < CRAWL_PROGRESS_INTERVAL:
+            return
+        self.last_log_time=now
+        logger.info(
+            f'Crawl progress: {self.pages_fetched} pages fetched, {self.pages_not_modified} not modified, {self.frontier.qsize()} queued, '
+            f'{len(self.downloads_info)} downloads found ({self.pages_per_second():.2f} pages/s)'
+        )
+        seen_stats=self.visited.stats()
+        logger.info(
+            f"Seen URLs: {seen_stats['urls']} in {seen_stats['filters']} filter(s), "
+            f"~{seen_stats['memory_bytes'] / 1024:.0f} KiB, est. false-positive rate {seen_stats['false_positive_rate']:.2e}"
+        )
+        for host_metrics in self.host_metrics():
+            logger.info(
+                f"Host {host_metrics['host']}: limit={host_metrics['limit']} in_flight={host_metrics['in_flight']} "
+                f"rate={host_metrics['requests_per_second']}/s throttled={host_metrics['throttled']} "
+                f"timeouts={host_metrics['timeouts']} latency={host_metrics['ewma_latency']}s"
+            )
+
+    async def process_url(self, session: ClientSession, current_url: str, hierarchy: List[str], lastmod: Optional[str], seed_url: str) -> None:
+        if current_url in self.visited:
+            return
+        if len(hierarchy) > self.depth_limit:
+            return
+        conditional_headers=self.metadata_store.conditional_headers(current_url) if self.incremental else None
+        controller=await self.get_host_controller(current_url, session)
+        page=await fetch_page(current_url, session, controller, conditional_headers)
+        if page['status']==304:
+            self.pages_not_modified+=1
+            return
+        html=page['html']
+        if not html:
+            return
+        self.pages_fetched+=1
+        if self.metadata_store:
+            self.metadata_store.update(current_url, kind='html', etag=page['etag'], last_modified=page['last_modified'], sitemap_lastmod=lastmod if current_url==seed_url else None)
+        seed_domain_parts=extract(seed_url)
+        seed_registered_domain=f"{seed_domain_parts.domain}.{seed_domain_parts.suffix}"
+        seed_netloc=urlparse(seed_url).netloc
+        links=[]
+        for raw_href in extract_links(html):
+            full_url=urljoin(current_url, raw_href)
+            if not full_url.startswith(('https://', 'https://')):
+                continue
+            normalized_url=normalize_url(full_url)
+            if normalized_url:
+                links.append(normalized_url)
+        download_links=[]
+        page_links=[]
+        for normalized_url in links:
+            if normalized_url.lower().endswith(self.download_extensions):
+                download_links.append(normalized_url)
+                continue
+            target_domain_parts=extract(normalized_url)
+            target_registered_domain=f"{target_domain_parts.domain}.{target_domain_parts.suffix}"
+            if target_registered_domain != seed_registered_domain:
+                continue
+            if urlparse(normalized_url).netloc == seed_netloc:
+                continue
+            if normalized_url in self.sitemap_url_set:
+                continue
+            page_links.append(normalized_url)
+        origins={f"{urlparse(link).scheme}://{urlparse(link).netloc}" for link in download_links+page_links}
+        await asyncio.gather(*(self.robots.get(origin_url, session) for origin_url in origins))
+        for normalized_url in download_links:
+            if self.robots.can_fetch(normalized_url):
+                if self.metadata_store:
+                    self.metadata_store.update(normalized_url, kind='pdf')
+                self.downloads_info.append({
+                    "download_url":normalized_url,
+                    "hierarchy":hierarchy.copy(),
+                    "lastmod":lastmod
+                })
+        for normalized_url in page_links:
+            if self.robots.can_fetch(normalized_url):
+                self.enqueue(normalized_url, hierarchy+[normalized_url], lastmod, seed_url)
+
+    async def worker(self, session: ClientSession) -> None:
+        while True:
+            current_url, hierarchy, lastmod, seed_url=await self.frontier.get()
+            try:
+                await self.process_url(session, current_url, hierarchy, lastmod, seed_url)
+            except Exception as e:
+                logger.error(f"Failed to crawl URL: {current_url} | {e}")
+            finally:
+                self.visited.add(current_url)
+                self.pending.pop(current_url, None)
+                self.frontier.task_done()
+                self.log_progress()
+                self.checkpoint()
+
+    def add_seed(self, link_info: Dict[str, Any]) -> None:
+        self.sitemap_url_set.add(link_info['url'])
+        self.seeds_added+=1
+        if self.incremental and self.metadata_store.sitemap_unchanged(link_info['url'], link_info.get('lastmod')):
+            self.seeds_skipped+=1
+            return
+        self.enqueue(link_info['url'], [link_info['url']], link_info.get('lastmod'), link_info['url'])
+
+    async def run(self, seeds: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        self.start_time=time.perf_counter()
+        self.last_log_time=self.start_time
+        self.last_checkpoint_time=self.start_time
+        if self.state:
+            for item in self.state.frontier:
+                self.enqueue(item['url'], item['hierarchy'], item.get('lastmod'), item['seed_url'])
+        connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=CRAWL_HOST_MAX_LIMIT, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            workers=[asyncio.create_task(self.worker(session)) for _ in range(self.concurrency)]
+            try:
+                if hasattr(seeds, '__aiter__'):
+                    async for link_info in seeds:
+                        self.add_seed(link_info)
+                else:
+                    for link_info in seeds:
+                        self.add_seed(link_info)
+                if self.seeds_skipped:
+                    logger.info(f'Skipped {self.seeds_skipped} sitemap URL(s) unchanged since the last crawl')
+                await self.frontier.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                self.checkpoint(force=True)
+        self.log_progress(force=True)
+        return self.downloads_info
 
 def parse_lastmod(lastmod):
     if not lastmod:
@@ -194,6 +766,35 @@ def deduplicate_downloads(downloads_info):
                     deduped[key]=record
     return list(deduped.values())
 
+def check_download_changed(url: str, metadata: Optional[UrlMetadata]) -> Tuple[bool, Dict[str, Optional[str]]]:
+    request_headers=dict(headers)
+    if metadata and metadata.etag:
+        request_headers['If-None-Match']=metadata.etag
+    if metadata and metadata.last_modified:
+        request_headers['If-Modified-Since']=metadata.last_modified
+    try:
+        response=requests.head(url, headers=request_headers, timeout=10, allow_redirects=True)
+    except Exception as e:
+        logger.error(f"Failed conditional check for url: {url} | {e}")
+        return True, {}
+    validators={
+          'etag':response.headers.get('ETag')
+        , 'last_modified':response.headers.get('Last-Modified')
+    }
+    if response.status_code==304:
+        return False, validators
+    if not metadata or not (metadata.etag or metadata.last_modified):
+        return True, validators
+    if validators['etag'] and validators['etag']==metadata.etag:
+        return False, validators
+    if not validators['etag'] and validators['last_modified'] and validators['last_modified']==metadata.last_modified:
+        return False, validators
+    return True, validators
+
+async def revalidate_downloads(urls: List[str], metadata_store: UrlMetadataStore) -> Dict[str, Tuple[bool, Dict[str, Optional[str]]]]:
+    results=await asyncio.gather(*(asyncio.to_thread(check_download_changed, url, metadata_store.get(url)) for url in urls))
+    return dict(zip(urls, results))
+
 def build_kb_record_from_crawl(download: dict) -> Optional[KnowledgeBaseRecord]:
     url=download['download_url']
     lastmod=download.get('lastmod')
@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from config import set_llm_budget
+from run_agent import run_agent
+from session_memory import SessionMemory
+from user_intent_profile.models import UserIntentProfile
+from utils import logger
+
+BATCH_CONCURRENCY=4
+BATCH_LLM_CONCURRENCY=8
+BATCH_THREADS_PER_PIPELINE=8
+
+def load_profiles(path: Path) -> List[Dict[str, Any]]:
+    text=path.read_text(encoding='utf-8').strip()
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+async def run_profile(index: int, profile_data: Dict[str, Any], output_dir: Path, fan_out: bool, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    async with semaphore:
+        start_time=time.perf_counter()
+        session=SessionMemory()
+        summary={'index':index, 'session_id':session.session_id, 'started_at':datetime.now().isoformat(timespec='seconds')}
+        try:
+            profile=UserIntentProfile(**profile_data)
+            profile.system_workflow.is_profile_complete=True
+            result=await run_agent(fan_out=fan_out, profile=profile, session=session)
+            output_path=output_dir / f'profile_{index:04d}.md'
+            await asyncio.to_thread(output_path.write_text, result or '', encoding='utf-8')
+            summary.update({'status':'completed' if result else 'empty', 'output_path':str(output_path)})
+        except Exception as e:
+            logger.error(f"Batch profile {index} failed: {e}")
+            summary.update({'status':'failed', 'error':str(e)})
+        summary['elapsed_seconds']=round(time.perf_counter()-start_time, 2)
+        return summary
+
+async def run_batch(profiles_path: Path, output_dir: Path, concurrency: int, llm_concurrency: int, fan_out: bool) -> List[Dict[str, Any]]:
+    profiles=load_profiles(profiles_path)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Running {len(profiles)} profile(s) with {concurrency} concurrent pipelines and an LLM budget of {llm_concurrency}.")
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency*BATCH_THREADS_PER_PIPELINE))
+    set_llm_budget(threading.BoundedSemaphore(llm_concurrency))
+    start_time=time.perf_counter()
+    semaphore=asyncio.Semaphore(concurrency)
+    summaries=[]
+    tasks=[asyncio.create_task(run_profile(idx, data, output_dir, fan_out, semaphore)) for idx, data in enumerate(profiles)]
+    for task in asyncio.as_completed(tasks):
+        summary=await task
+        summaries.append(summary)
+        logger.info(f"Profile {summary['index']} {summary['status']} in {summary['elapsed_seconds']}s ({len(summaries)}/{len(profiles)})")
+    summaries.sort(key=lambda s: s['index'])
+    elapsed=round(time.perf_counter()-start_time, 2)
+    with (output_dir / 'summary.json').open('w', encoding='utf-8') as f:
+        json.dump({'elapsed_seconds':elapsed, 'profiles':summaries}, f, ensure_ascii=False, indent=2)
+    logger.info(f"Batch completed in {elapsed}s; summary written to {output_dir / 'summary.json'}")
+    return summaries
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Run the research agent over prepared user intent profiles without clarification.')
+    parser.add_argument('profiles', type=Path, help='JSON array or JSONL file of serialized UserIntentProfile objects')
+    parser.add_argument('--output-dir', type=Path, default=Path('batch_output'))
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument('--llm-concurrency', type=int, default=BATCH_LLM_CONCURRENCY)
+    parser.add_argument('--fan-out', action='store_true')
+    args=parser.parse_args()
+    asyncio.run(run_batch(args.profiles, args.output_dir, args.concurrency, args.llm_concurrency, args.fan_out))
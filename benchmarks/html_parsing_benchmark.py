@@ -0,0 +1,40 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from html_parsing import BACKENDS
+
+def time_call(func, html: str, iterations: int) -> float:
+    start=time.perf_counter()
+    for _ in range(iterations):
+        func(html)
+    return (time.perf_counter()-start)/iterations*1000
+
+def run_benchmark(fixtures_dir: Path, iterations: int) -> None:
+    fixtures=sorted(fixtures_dir.glob('*.html'))
+    if not fixtures:
+        print(f'No .html fixtures found in {fixtures_dir}')
+        return
+    print(f"{'fixture':<28}{'backend':<10}{'links ms':>10}{'segment ms':>12}{'links':>8}{'sections':>10}")
+    for fixture in fixtures:
+        html=fixture.read_text(encoding='utf-8', errors='replace')
+        for backend, (extract_links, segment_html) in BACKENDS.items():
+            try:
+                links=extract_links(html)
+                sections=segment_html(html)['sections']
+            except ImportError as e:
+                print(f'{fixture.name:<28}{backend:<10}  unavailable ({e.name})')
+                continue
+            links_ms=time_call(extract_links, html, iterations)
+            segment_ms=time_call(segment_html, html, iterations)
+            print(f'{fixture.name:<28}{backend:<10}{links_ms:>10.3f}{segment_ms:>12.3f}{len(links):>8}{len(sections):>10}')
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Compare HTML parsing backends on saved pages.')
+    parser.add_argument('--fixtures', type=Path, default=Path(__file__).resolve().parent / 'fixtures')
+    parser.add_argument('--iterations', type=int, default=50)
+    args=parser.parse_args()
+    run_benchmark(args.fixtures, args.iterations)
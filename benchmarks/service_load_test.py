@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+import aiohttp
+
+DEFAULT_PROFILE={
+      'customer_profile':{'corporate_function':'Product', 'product_area':'Identity Graph', 'job_focus':['compare partner offerings']}
+    , 'research_focus':[{
+          'target_companies':[{'name':'Example Co', 'source':'user_provided', 'seed_for_expansion':False}]
+        , 'target_market':'identity resolution'
+        , 'target_capabilities':['household matching']
+        , 'desired_outputs':['paragraph_summary']
+    }]
+}
+
+async def run_session(http: aiohttp.ClientSession, base_url: str, profile: dict) -> dict:
+    start=time.perf_counter()
+    async with http.post(f'{base_url}/sessions', json={'profile':profile}) as resp:
+        resp.raise_for_status()
+        session_id=(await resp.json())['session_id']
+    first_token=None
+    size=0
+    event=None
+    async with http.get(f'{base_url}/sessions/{session_id}/answer') as resp:
+        resp.raise_for_status()
+        async for raw_line in resp.content:
+            line=raw_line.decode('utf-8').rstrip('\n')
+            if line.startswith('event: '):
+                event=line[len('event: '):]
+            elif line.startswith('data: '):
+                data=json.loads(line[len('data: '):])
+                if event=='error':
+                    raise RuntimeError(data.get('error'))
+                if event is None:
+                    if first_token is None:
+                        first_token=time.perf_counter()-start
+                    size+=len(data.encode('utf-8'))
+            elif not line:
+                event=None
+    await http.delete(f'{base_url}/sessions/{session_id}')
+    return {'ttfb':first_token, 'total':time.perf_counter()-start, 'bytes':size}
+
+def percentile(values: list, pct: float) -> float:
+    ordered=sorted(values)
+    return ordered[min(len(ordered)-1, int(round(pct/100*(len(ordered)-1))))]
+
+async def run_load_test(base_url: str, sessions: int, concurrency: int, profile: dict) -> None:
+    semaphore=asyncio.Semaphore(concurrency)
+    results=[]
+    failures=0
+
+    async def bounded(http: aiohttp.ClientSession) -> None:
+        nonlocal failures
+        async with semaphore:
+            try:
+                results.append(await run_session(http, base_url, profile))
+            except Exception as e:
+                failures+=1
+                print(f'session failed: {e}')
+
+    start=time.perf_counter()
+    timeout=aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as http:
+        await asyncio.gather(*(bounded(http) for _ in range(sessions)))
+    elapsed=time.perf_counter()-start
+
+    print(f'{len(results)} sessions completed, {failures} failed in {elapsed:.2f}s ({len(results)/elapsed:.2f} sessions/s)')
+    for metric in ('ttfb', 'total'):
+        values=[r[metric] for r in results if r[metric] is not None]
+        if values:
+            print(f'{metric:<6} p50 {statistics.median(values):.3f}s  p95 {percentile(values, 95):.3f}s  max {max(values):.3f}s')
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Load test the agent HTTP service with prepared-profile sessions. Start benchmarks/stub_model_server.py, then run service.py with OPENAI_BASE_URL=http://127.0.0.1:8100/v1 to exercise it without a real model.')
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=25)
+    parser.add_argument('--profile', type=Path, help='JSON file with a serialized UserIntentProfile')
+    args=parser.parse_args()
+    profile=json.loads(args.profile.read_text(encoding='utf-8')) if args.profile else DEFAULT_PROFILE
+    asyncio.run(run_load_test(args.url, args.sessions, args.concurrency, profile))
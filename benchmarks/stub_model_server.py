@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+
+from aiohttp import web
+
+EMBEDDING_DIMENSIONS=64
+STUB_ANSWER='This is a stubbed answer used to load test the agent service without calling a real model. ' * 4
+
+def stub_embedding(text: str) -> list:
+    digest=hashlib.sha256(text.encode('utf-8')).digest()
+    return [(digest[i % len(digest)] - 128) / 128 for i in range(EMBEDDING_DIMENSIONS)]
+
+def stub_value(schema: dict):
+    schema_type=schema.get('type')
+    if schema_type=='object':
+        return {key: stub_value(value) for key, value in schema.get('properties', {}).items()}
+    if schema_type=='array':
+        return []
+    if schema_type=='boolean':
+        return False
+    if schema_type in ('integer', 'number'):
+        return 0
+    return 'stub'
+
+def build_response(model: str, text: str, status: str='completed') -> dict:
+    return {
+          'id':'resp_stub'
+        , 'object':'response'
+        , 'created_at':int(time.time())
+        , 'status':status
+        , 'model':model
+        , 'output':[] if status!='completed' else [{
+              'type':'message'
+            , 'id':'msg_stub'
+            , 'status':'completed'
+            , 'role':'assistant'
+            , 'content':[{'type':'output_text', 'text':text, 'annotations':[]}]
+        }]
+    }
+
+def create_app(latency: float, token_delay: float) -> web.Application:
+    async def embeddings(request: web.Request) -> web.Response:
+        body=await request.json()
+        await asyncio.sleep(latency)
+        inputs=body['input'] if isinstance(body['input'], list) else [body['input']]
+        return web.json_response({
+              'object':'list'
+            , 'model':body.get('model')
+            , 'data':[{'object':'embedding', 'index':i, 'embedding':stub_embedding(str(text))} for i, text in enumerate(inputs)]
+            , 'usage':{'prompt_tokens':0, 'total_tokens':0}
+        })
+
+    async def responses(request: web.Request) -> web.StreamResponse:
+        body=await request.json()
+        await asyncio.sleep(latency)
+        model=body.get('model', 'stub')
+        text_format=(body.get('text') or {}).get('format') or {}
+        if text_format.get('type')=='json_schema':
+            text=json.dumps(stub_value(text_format['schema']))
+        else:
+            text=STUB_ANSWER
+        if not body.get('stream'):
+            return web.json_response(build_response(model, text))
+
+        response=web.StreamResponse(headers={'Content-Type':'text/event-stream'})
+        await response.prepare(request)
+        sequence=0
+
+        async def send(event: dict) -> None:
+            nonlocal sequence
+            event['sequence_number']=sequence
+            sequence+=1
+            await response.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode('utf-8'))
+
+        await send({'type':'response.created', 'response':build_response(model, '', status='in_progress')})
+        for word in text.split(' '):
+            await asyncio.sleep(token_delay)
+            await send({'type':'response.output_text.delta', 'item_id':'msg_stub', 'output_index':0, 'content_index':0, 'delta':word + ' '})
+        await send({'type':'response.completed', 'response':build_response(model, text)})
+        await response.write_eof()
+        return response
+
+    app=web.Application()
+    app.add_routes([
+          web.post('/v1/embeddings', embeddings)
+        , web.post('/v1/responses', responses)
+    ])
+    return app
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Serve a stubbed OpenAI-compatible backend for load testing.')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds to wait before answering each request')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='Seconds between streamed tokens')
+    args=parser.parse_args()
+    web.run_app(create_app(args.latency, args.token_delay), host='127.0.0.1', port=args.port)
@@ -1,6 +1,8 @@
 import os
+import asyncio
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI, AsyncOpenAI
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 
 env_path=os.path.join(os.path.dirname(__file__), '.env.txt')
 load_dotenv(dotenv_path=env_path)
@@ -11,5 +13,80 @@ admin_password=os.getenv('admin_password')
 uip_id=os.getenv('uip_assistant_id')
 rg_id=os.getenv('rg_assistant_id')
 
-client=OpenAI(api_key=openAI_api_key)
-async_client=AsyncOpenAI(api_key=openAI_api_key)
\ No newline at end of file
+llm_budget=None
+
+def set_llm_budget(semaphore) -> None:
+    global llm_budget
+    llm_budget=semaphore
+
+class BudgetPermit:
+    def __init__(self, budget):
+        self.budget=budget
+        self.released=False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released=True
+            self.budget.release()
+
+class BudgetedByteStream(httpx.SyncByteStream):
+    def __init__(self, stream, permit: BudgetPermit):
+        self.stream=stream
+        self.permit=permit
+
+    def __iter__(self):
+        yield from self.stream
+
+    def close(self) -> None:
+        try:
+            self.stream.close()
+        finally:
+            self.permit.release()
+
+class AsyncBudgetedByteStream(httpx.AsyncByteStream):
+    def __init__(self, stream, permit: BudgetPermit):
+        self.stream=stream
+        self.permit=permit
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self.stream.aclose()
+        finally:
+            self.permit.release()
+
+class BudgetedTransport(httpx.HTTPTransport):
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        budget=llm_budget
+        if budget is None:
+            return super().handle_request(request)
+        budget.acquire()
+        permit=BudgetPermit(budget)
+        try:
+            response=super().handle_request(request)
+        except BaseException:
+            permit.release()
+            raise
+        response.stream=BudgetedByteStream(response.stream, permit)
+        return response
+
+class AsyncBudgetedTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        budget=llm_budget
+        if budget is None:
+            return await super().handle_async_request(request)
+        await asyncio.to_thread(budget.acquire)
+        permit=BudgetPermit(budget)
+        try:
+            response=await super().handle_async_request(request)
+        except BaseException:
+            permit.release()
+            raise
+        response.stream=AsyncBudgetedByteStream(response.stream, permit)
+        return response
+
+client=OpenAI(api_key=openAI_api_key, http_client=DefaultHttpxClient(transport=BudgetedTransport(limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100))))
+async_client=AsyncOpenAI(api_key=openAI_api_key, http_client=DefaultAsyncHttpxClient(transport=AsyncBudgetedTransport(limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100))))
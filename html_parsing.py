@@ -0,0 +1,185 @@
+import importlib.util
+import logging
+import os
+import re
+from html.parser import HTMLParser
+from typing import List, Dict, Any, Optional
+
+logger=logging.getLogger(__name__)
+
+HTML_PARSER_BACKEND=os.getenv('html_parser_backend', 'auto')
+HEADING_TAGS={'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+SKIPPED_TAGS={'script', 'style', 'template'}
+LIST_TAGS={'ul', 'ol'}
+
+def normalize_whitespace(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip()
+
+def build_segments(text_parts: List[str], image_present: bool, elements: List[Dict[str, str]]) -> Dict[str, Any]:
+    sections=[]
+    for element in elements:
+        if element['tag'] in HEADING_TAGS:
+            sections.append({'heading':element['text'], 'items':[]})
+        elif sections and element['text']:
+            sections[-1]['items'].append(element['text'] if element['tag']=='p' else f"-  {element['text']}")
+    return {
+          'text':' '.join(part for part in text_parts if part)
+        , 'image_present':image_present
+        , 'sections':sections
+    }
+
+class StreamingHTMLTokenizer(HTMLParser):
+    def __init__(self, collect_segments: bool=True):
+        super().__init__(convert_charrefs=True)
+        self.collect_segments=collect_segments
+        self.links: List[str]=[]
+        self.text_parts: List[str]=[]
+        self.image_present=False
+        self.elements: List[Dict[str, Any]]=[]
+        self.open_captures: List[Dict[str, Any]]=[]
+        self.skip_depth=0
+        self.list_depth=0
+
+    def close_captures(self, tags: set) -> None:
+        while self.open_captures and self.open_captures[-1]['tag'] in tags:
+            self.finish_capture(self.open_captures.pop())
+
+    def close_captures_from(self, index: int) -> None:
+        for capture in reversed(self.open_captures[index:]):
+            self.finish_capture(capture)
+        del self.open_captures[index:]
+
+    def close_list_items(self, depth: int) -> None:
+        for i, capture in enumerate(self.open_captures):
+            if capture['tag']=='li' and capture['depth']>=depth:
+                self.close_captures_from(i)
+                return
+
+    def finish_capture(self, capture: Dict[str, Any]) -> None:
+        capture['element']['text']=normalize_whitespace(' '.join(capture['parts']))
+
+    def handle_starttag(self, tag: str, attrs: List) -> None:
+        if tag in SKIPPED_TAGS:
+            self.skip_depth+=1
+            return
+        if tag=='a':
+            href=dict(attrs).get('href')
+            if href:
+                self.links.append(href)
+        elif tag=='img':
+            self.image_present=True
+        if not self.collect_segments:
+            return
+        if tag in HEADING_TAGS or tag in LIST_TAGS or tag in ('p', 'li'):
+            self.close_captures({'p'} | HEADING_TAGS)
+        if tag=='li':
+            self.close_list_items(self.list_depth)
+        elif tag in LIST_TAGS:
+            self.list_depth+=1
+        if tag in HEADING_TAGS or tag in ('p', 'li'):
+            element={'tag':tag, 'text':''}
+            self.elements.append(element)
+            self.open_captures.append({'tag':tag, 'element':element, 'parts':[], 'depth':self.list_depth})
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIPPED_TAGS:
+            self.skip_depth=max(0, self.skip_depth-1)
+            return
+        if not self.collect_segments:
+            return
+        if tag in LIST_TAGS:
+            if self.list_depth:
+                self.close_list_items(self.list_depth)
+                self.list_depth-=1
+            return
+        for i in range(len(self.open_captures)-1, -1, -1):
+            if self.open_captures[i]['tag']==tag:
+                self.close_captures_from(i)
+                break
+
+    def handle_data(self, data: str) -> None:
+        if self.skip_depth or not self.collect_segments:
+            return
+        stripped=data.strip()
+        if not stripped:
+            return
+        self.text_parts.append(stripped)
+        for capture in self.open_captures:
+            capture['parts'].append(stripped)
+
+    def close(self) -> None:
+        super().close()
+        for capture in reversed(self.open_captures):
+            self.finish_capture(capture)
+        self.open_captures=[]
+
+def stream_extract_links(html: str) -> List[str]:
+    tokenizer=StreamingHTMLTokenizer(collect_segments=False)
+    tokenizer.feed(html)
+    tokenizer.close()
+    return tokenizer.links
+
+def stream_segment_html(html: str) -> Dict[str, Any]:
+    tokenizer=StreamingHTMLTokenizer()
+    tokenizer.feed(html)
+    tokenizer.close()
+    return build_segments(tokenizer.text_parts, tokenizer.image_present, tokenizer.elements)
+
+def lxml_extract_links(html: str) -> List[str]:
+    import lxml.html
+    return [href for href in lxml.html.fromstring(html).xpath('//a/@href') if href]
+
+def lxml_segment_html(html: str) -> Dict[str, Any]:
+    import lxml.html
+    doc=lxml.html.fromstring(html)
+    text_parts=[t.strip() for t in doc.xpath('//text()[not(ancestor::script) and not(ancestor::style) and not(ancestor::template)]')]
+    elements=[
+        {'tag':el.tag, 'text':normalize_whitespace(el.text_content())}
+        for el in doc.iter(*HEADING_TAGS, 'p', 'li')
+    ]
+    return build_segments(text_parts, bool(doc.xpath('//img')), elements)
+
+def bs4_extract_links(html: str) -> List[str]:
+    from bs4 import BeautifulSoup
+    return [a_tag['href'] for a_tag in BeautifulSoup(html, 'html.parser').find_all('a', href=True)]
+
+def bs4_segment_html(html: str) -> Dict[str, Any]:
+    from bs4 import BeautifulSoup
+    soup=BeautifulSoup(html, 'html.parser')
+    elements=[
+        {'tag':el.name, 'text':normalize_whitespace(el.get_text(separator=' ', strip=True))}
+        for el in soup.find_all(list(HEADING_TAGS) + ['p', 'li'])
+    ]
+    return build_segments([soup.get_text(separator=' ', strip=True)], bool(soup.find_all('img')), elements)
+
+BACKENDS={
+      'lxml':(lxml_extract_links, lxml_segment_html)
+    , 'stream':(stream_extract_links, stream_segment_html)
+    , 'bs4':(bs4_extract_links, bs4_segment_html)
+}
+
+def resolve_backend(backend: Optional[str]=None) -> str:
+    backend=backend or HTML_PARSER_BACKEND
+    if backend!='auto':
+        return backend
+    return 'lxml' if importlib.util.find_spec('lxml') else 'stream'
+
+def extract_links(html: str, backend: Optional[str]=None) -> List[str]:
+    backend=resolve_backend(backend)
+    try:
+        return BACKENDS[backend][0](html)
+    except Exception as e:
+        if backend=='bs4':
+            raise
+        logger.warning(f"HTML link extraction with '{backend}' failed, falling back to bs4: {e}")
+        return bs4_extract_links(html)
+
+def segment_html(html: str, backend: Optional[str]=None) -> Dict[str, Any]:
+    backend=resolve_backend(backend)
+    try:
+        return BACKENDS[backend][1](html)
+    except Exception as e:
+        if backend=='bs4':
+            raise
+        logger.warning(f"HTML segmentation with '{backend}' failed, falling back to bs4: {e}")
+        return bs4_segment_html(html)
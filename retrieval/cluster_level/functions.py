@@ -1,10 +1,11 @@
 from retrieval.record_level.functions import record_level_rag
 from storage.knowledge_base import KnowledgeBase
 from session_memory import session_memory
+from retrieval.prefetch import score_clusters
 
 from typing import List
 
-from utils import logger, embed_text, cosine_similarity, batch_items
+from utils import logger, embed_text, batch_items
 from config import client
 
 import json
@@ -12,7 +13,7 @@ import json
 def cluster_level_retrieval(records: List[str]):
     profile_query=session_memory.load_profile_query()
     profile_embedding=embed_text(profile_query)
-    kb=KnowledgeBase().load_all()
+    kb=KnowledgeBase().load_snapshot()
     filtered_clusters=[]
     total_records=len(kb)
     if total_records < 20:
@@ -23,15 +24,15 @@ def cluster_level_retrieval(records: List[str]):
         threshold = 0.55
     else:
         threshold = 0.6
-    for record in kb:
-        if record.record_id not in records:
-            continue
+    selected_records=[record for record in kb if record.record_id in records]
+    cluster_scores=score_clusters(session_memory.session_id, profile_query, profile_embedding, selected_records)
+    for record in selected_records:
         if not record.paragraph_clusters:
             continue
         for cluster in record.paragraph_clusters:
             if not cluster.extracted_facts:
                 continue
-            sim=cosine_similarity(profile_embedding, cluster.embedding)
+            sim=cluster_scores[cluster.cluster_id]
             if sim >= threshold:
                 filtered_clusters.append({
                       'cluster_id':cluster.cluster_id
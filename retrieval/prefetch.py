@@ -0,0 +1,102 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, List, Optional
+
+from session_memory import build_profile_query
+from storage.knowledge_base import KnowledgeBase
+from storage.models import KnowledgeBaseRecord
+from user_intent_profile.models import UserIntentProfile
+from utils import logger, embed_text, cosine_similarity
+
+PREFETCH_TRIGGER_TOOLS={'set_target_companies', 'set_target_market', 'set_target_capabilities'}
+
+class RetrievalPrefetcher:
+    def __init__(self, session_id: str):
+        self.session_id=session_id
+        self.started=False
+        self.executor=ThreadPoolExecutor(max_workers=1)
+        self.lock=Lock()
+        self.pending: Optional[Future]=None
+        self.query: Optional[str]=None
+        self.scores: Dict[str, float]={}
+
+    def notify(self, profile: UserIntentProfile, tool_name: str) -> None:
+        if tool_name in PREFETCH_TRIGGER_TOOLS:
+            self.started=True
+        if not self.started:
+            return
+        query=build_profile_query(profile)
+        if not query or query==self.query:
+            return
+        self.query=query
+        self.pending=self.executor.submit(self.prefetch, query)
+
+    def prefetch(self, query: str) -> None:
+        if query!=self.query:
+            return
+        try:
+            embedding=embed_text(query)
+            records=KnowledgeBase().load_snapshot()
+            if embedding is None or query!=self.query:
+                return
+            scores=self.compute_scores(embedding, records, {})
+            with self.lock:
+                if query==self.query:
+                    self.scores=scores
+            logger.info(f"Prefetched {len(scores)} cluster score(s) for partial profile query")
+        except Exception as e:
+            logger.warning(f"Retrieval prefetch failed: {e}")
+
+    def compute_scores(self, embedding: List[float], records: List[KnowledgeBaseRecord], known: Dict[str, float]) -> Dict[str, float]:
+        scores={}
+        for record in records:
+            for cluster in record.paragraph_clusters or []:
+                if cluster.cluster_id in known:
+                    scores[cluster.cluster_id]=known[cluster.cluster_id]
+                else:
+                    scores[cluster.cluster_id]=cosine_similarity(embedding, cluster.embedding)
+        return scores
+
+    def score(self, query: str, embedding: List[float], records: List[KnowledgeBaseRecord]) -> Dict[str, float]:
+        if self.pending and query==self.query:
+            self.pending.result()
+        with self.lock:
+            known=self.scores if query==self.query else {}
+        scores=self.compute_scores(embedding, records, known)
+        reused=sum(1 for cluster_id in scores if cluster_id in known)
+        logger.info(f"Cluster scoring reused {reused} prefetched score(s) and computed {len(scores)-reused}")
+        with self.lock:
+            if query!=self.query:
+                self.query=query
+                self.scores={}
+            self.scores.update(scores)
+        return scores
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+PREFETCHERS: Dict[str, RetrievalPrefetcher]={}
+
+def get_prefetcher(session_id: str) -> Optional[RetrievalPrefetcher]:
+    return PREFETCHERS.get(session_id)
+
+def register_prefetcher(session_id: str) -> RetrievalPrefetcher:
+    prefetcher=PREFETCHERS.get(session_id)
+    if not prefetcher:
+        prefetcher=RetrievalPrefetcher(session_id)
+        PREFETCHERS[session_id]=prefetcher
+    return prefetcher
+
+def discard_prefetcher(session_id: str) -> None:
+    prefetcher=PREFETCHERS.pop(session_id, None)
+    if prefetcher:
+        prefetcher.close()
+
+def score_clusters(session_id: str, query: str, embedding: List[float], records: List[KnowledgeBaseRecord]) -> Dict[str, float]:
+    prefetcher=get_prefetcher(session_id)
+    if prefetcher:
+        return prefetcher.score(query, embedding, records)
+    return {
+        cluster.cluster_id:cosine_similarity(embedding, cluster.embedding)
+        for record in records for cluster in record.paragraph_clusters or []
+    }
@@ -1,9 +1,10 @@
 from config import client
-from utils import logger, embed_text, cosine_similarity, batch_items
+from utils import logger, embed_text, batch_items
 from typing import List, Dict, Any, Generator, Optional
 
 from storage.knowledge_base import KnowledgeBase
 from session_memory import session_memory
+from retrieval.prefetch import score_clusters
 
 import pandas as pd
 import json
@@ -15,7 +16,8 @@ def record_level_retrieval() -> Dict:
     if not session_records:
         session_records=[]
     similarity_rows=[]
-    kb=KnowledgeBase().load_all()
+    kb=KnowledgeBase().load_snapshot()
+    cluster_scores=score_clusters(session_memory.session_id, profile_query, profile_embedding, kb)
     for record in kb:
         if not record.paragraph_clusters:
             continue
@@ -23,9 +25,9 @@ def record_level_retrieval() -> Dict:
             similarity_rows.append({
                   'cluster_id':cluster.cluster_id
                 , 'record_id':cluster.record_id
-                , 'sim':cosine_similarity(profile_embedding, cluster.embedding)
+                , 'sim':cluster_scores[cluster.cluster_id]
             })
-    similarity_df=pd.DataFrame(similarity_rows)
+    similarity_df=pd.DataFrame(similarity_rows, columns=['cluster_id', 'record_id', 'sim'])
     grouped_similarity=similarity_df.groupby('record_id').agg(mean_similarity=('sim','mean')).reset_index()
     final_rows=[]
     for record in kb:
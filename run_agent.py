@@ -2,38 +2,121 @@ from user_intent_profile.user_intent_profile import run_user_intent_loop
 
 from synthesis.record_level_decision import get_record_level_decision
 from synthesis.cluster_level_decision import get_cluster_level_decision
-from synthesis.answer_generation import run_response_generation
+from synthesis.response_generation import run_response_generation
 
 from retrieval.record_level.functions import record_level_rag
 from retrieval.cluster_level.functions import cluster_level_rag
 
 from web_search.web_search import perform_web_search
+from web_search.functions import SEARCH_FAN_OUT
+from web_search.pipeline import IngestionPipeline, close_pipelines
 
-from typing import Optional
+from typing import Callable, List, Optional
+from user_intent_profile.models import UserIntentProfile
+from session_memory import session_memory, use_session, get_session_memory, SessionMemory
+from storage.session_checkpoints import SessionCheckpoint, SessionCheckpointStore
+from retrieval.prefetch import discard_prefetcher
 
+import argparse
+import asyncio
 import time
 
 from utils import logger
 
-async def run_agent() -> Optional[str]:
+async def run_agent(fan_out: bool=SEARCH_FAN_OUT, profile: Optional[UserIntentProfile]=None, session: Optional[SessionMemory]=None, on_token: Optional[Callable[[str], None]]=None) -> Optional[str]:
+    with use_session(session) as active_session:
+        checkpoint=SessionCheckpoint(session_id=active_session.session_id, interactive=profile is None)
+        return await run_agent_session(fan_out=fan_out, profile=profile, on_token=on_token, checkpoint=checkpoint)
+
+async def resume_agent(session_id: str, fan_out: bool=SEARCH_FAN_OUT, on_token: Optional[Callable[[str], None]]=None) -> Optional[str]:
+    checkpoint=SessionCheckpointStore(session_id).load()
+    if not checkpoint:
+        raise ValueError(f"No checkpoint found for session '{session_id}'")
+    logger.info(f"Resuming session {session_id} after stage '{checkpoint.stage}' (checkpointed {checkpoint.updated_at})")
+    with use_session(SessionMemory(**checkpoint.memory)):
+        return await run_agent_session(fan_out=fan_out, profile=None, on_token=on_token, checkpoint=checkpoint)
+
+async def run_agent_session(fan_out: bool, profile: Optional[UserIntentProfile], checkpoint: SessionCheckpoint, on_token: Optional[Callable[[str], None]]=None) -> Optional[str]:
     start_time=time.perf_counter()
-    profile=run_user_intent_loop()
-    record_level_decision=get_record_level_decision()
-    if record_level_decision.get('fallback_to_web_search'):
-        logger.info(f'Agent has decided to fallback to web search')
-        logger.info(f"Rationale: {record_level_decision.get('rationale')}")
-        await perform_web_search()
-    while True:
-        selected_record_ids=record_level_rag()
-        cluster_level_rag(selected_record_ids)
-        cluster_level_decision=get_cluster_level_decision()
-        if not cluster_level_decision.get('fallback_to_web_search'):
-            logger.info(f'Agent has decided to proceed to answer generatation')
+    pipelines: List[IngestionPipeline]=[]
+    store=SessionCheckpointStore(checkpoint.session_id)
+    resume_stage=checkpoint.stage
+
+    def save_checkpoint(stage: str) -> None:
+        checkpoint.stage=stage
+        checkpoint.memory=get_session_memory().model_dump()
+        store.save(checkpoint)
+
+    async def fallback_to_web_search() -> None:
+        in_flight_urls=set().union(*(p.urls for p in pipelines if not p.done))
+        pipelines.append(await perform_web_search(fan_out=fan_out, in_flight_urls=in_flight_urls))
+        save_checkpoint('searched')
+
+    try:
+        if resume_stage is None:
+            if checkpoint.interactive:
+                profile=run_user_intent_loop()
+            else:
+                session_memory.save_user_intent_profile(profile)
+            save_checkpoint('clarified')
+        if resume_stage in (None, 'clarified'):
+            checkpoint.record_level_decision=await asyncio.to_thread(get_record_level_decision)
+            if not checkpoint.record_level_decision:
+                raise RuntimeError('Record level decision failed')
+            save_checkpoint('record_decided')
+        if resume_stage in (None, 'clarified', 'record_decided'):
+            record_level_decision=checkpoint.record_level_decision
+            if record_level_decision.get('fallback_to_web_search'):
+                logger.info(f'Agent has decided to fallback to web search')
+                logger.info(f"Rationale: {record_level_decision.get('rationale')}")
+                await fallback_to_web_search()
+            resume_stage=None
+        while True:
+            if resume_stage not in ('records_selected', 'clusters_selected', 'cluster_decided'):
+                checkpoint.selected_record_ids=await asyncio.to_thread(record_level_rag)
+                save_checkpoint('records_selected')
+            if resume_stage not in ('clusters_selected', 'cluster_decided'):
+                await asyncio.to_thread(cluster_level_rag, checkpoint.selected_record_ids)
+                save_checkpoint('clusters_selected')
+            if resume_stage!='cluster_decided':
+                checkpoint.cluster_level_decision=await asyncio.to_thread(get_cluster_level_decision)
+                if not checkpoint.cluster_level_decision:
+                    raise RuntimeError('Cluster level decision failed')
+                save_checkpoint('cluster_decided')
+            resume_stage=None
+            cluster_level_decision=checkpoint.cluster_level_decision
+            if not cluster_level_decision.get('fallback_to_web_search'):
+                logger.info(f'Agent has decided to proceed to answer generatation')
+                logger.info(f"Rationale: {cluster_level_decision.get('rationale')}")
+                if checkpoint.interactive and not on_token:
+                    print('Agent:')
+                    result=await asyncio.to_thread(run_response_generation, on_token=lambda token: print(token, end='', flush=True))
+                    print()
+                else:
+                    result=await asyncio.to_thread(run_response_generation, on_token=on_token)
+                if result is None:
+                    raise RuntimeError('Response generation failed')
+                store.clear()
+                elapsed=time.perf_counter()-start_time
+                logger.info(f'Agent response generation completed in {elapsed:.2f} seconds')
+                return result
+            logger.info(f'Agent has decided to fallback to web_search')
             logger.info(f"Rationale: {cluster_level_decision.get('rationale')}")
-            result=run_response_generation()
-            elapsed=time.perf_counter()-start_time
-            logger.info(f'Agent response generation completed in {elapsed:.2f} seconds')
-            return result
-        logger.info(f'Agent has decided to fallback to web_search')
-        logger.info(f"Rationale: {cluster_level_decision.get('rationale')}")
-        await perform_web_search()
\ No newline at end of file
+            await fallback_to_web_search()
+    except Exception:
+        if checkpoint.stage:
+            logger.error(f"Agent run failed after stage '{checkpoint.stage}'; resume with `python run_agent.py --resume {checkpoint.session_id}`")
+        raise
+    finally:
+        discard_prefetcher(checkpoint.session_id)
+        await close_pipelines(pipelines)
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Run the research agent interactively, or resume a checkpointed session.')
+    parser.add_argument('--resume', metavar='SESSION_ID', help='resume the checkpointed session with this id')
+    parser.add_argument('--fan-out', action='store_true', default=SEARCH_FAN_OUT)
+    args=parser.parse_args()
+    if args.resume:
+        asyncio.run(resume_agent(args.resume, fan_out=args.fan_out))
+    else:
+        asyncio.run(run_agent(fan_out=args.fan_out))
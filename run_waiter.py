@@ -0,0 +1,109 @@
+import random
+import time
+from typing import List, Dict, Optional
+
+from config import client
+from utils import logger
+
+RUN_TERMINAL_STATUSES={'completed', 'failed', 'cancelled', 'expired', 'incomplete', 'requires_action'}
+RUN_WAIT_TIMEOUT=120.0
+RUN_POLL_INITIAL_DELAY=0.1
+RUN_POLL_MAX_DELAY=2.0
+RUN_POLL_BACKOFF=1.6
+RUN_STREAM_IDLE_TIMEOUT=15.0
+RUN_ACTIVE_STATUSES={'queued', 'in_progress', 'requires_action', 'cancelling'}
+RUN_ACTIVE_LOOKUP_LIMIT=5
+
+class RunTimeoutError(TimeoutError):
+    pass
+
+class RunStreamUnavailable(Exception):
+    pass
+
+def backoff_delays(initial: float=RUN_POLL_INITIAL_DELAY, maximum: float=RUN_POLL_MAX_DELAY, factor: float=RUN_POLL_BACKOFF):
+    delay=initial
+    while True:
+        yield random.uniform(initial, delay)
+        delay=min(maximum, delay*factor)
+
+def cancel_run(thread_id: str, run_id: str) -> None:
+    try:
+        client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+    except Exception as e:
+        logger.warning(f"Failed to cancel run {run_id}: {e}")
+
+def wait_for_run(thread_id: str, run_id: str, timeout: float=RUN_WAIT_TIMEOUT):
+    deadline=time.monotonic()+timeout
+    for delay in backoff_delays():
+        run=client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+        if run.status in RUN_TERMINAL_STATUSES:
+            return run
+        remaining=deadline-time.monotonic()
+        if remaining <= 0:
+            cancel_run(thread_id, run_id)
+            raise RunTimeoutError(f"Run {run_id} did not finish within {timeout}s (last status: '{run.status}')")
+        time.sleep(min(delay, remaining))
+
+def consume_run_stream(stream_manager, thread_id: str, timeout: float, run_id: Optional[str]=None):
+    deadline=time.monotonic()+timeout
+    try:
+        stream=stream_manager.__enter__()
+    except Exception as e:
+        raise RunStreamUnavailable(str(e)) from e
+    try:
+        for event in stream:
+            if time.monotonic() > deadline:
+                run=stream.current_run
+                if run:
+                    cancel_run(thread_id, run.id)
+                raise RunTimeoutError(f"Run stream did not finish within {timeout}s")
+        return stream.get_final_run()
+    except RunTimeoutError:
+        raise
+    except Exception as e:
+        run_id=stream.current_run.id if stream.current_run else run_id
+        if not run_id:
+            raise RunStreamUnavailable(str(e)) from e
+        logger.warning(f"Run stream for {run_id} interrupted, falling back to polling: {e}")
+        return wait_for_run(thread_id, run_id, max(0.0, deadline-time.monotonic()))
+    finally:
+        try:
+            stream_manager.__exit__(None, None, None)
+        except Exception:
+            pass
+
+def find_active_run(thread_id: str, assistant_id: str):
+    runs=client.beta.threads.runs.list(thread_id=thread_id, order='desc', limit=RUN_ACTIVE_LOOKUP_LIMIT)
+    for run in runs.data:
+        if run.assistant_id == assistant_id and run.status in RUN_ACTIVE_STATUSES:
+            return run
+    return None
+
+def run_and_wait(thread_id: str, assistant_id: str, timeout: float=RUN_WAIT_TIMEOUT):
+    try:
+        return consume_run_stream(
+              client.beta.threads.runs.stream(thread_id=thread_id, assistant_id=assistant_id, timeout=min(timeout, RUN_STREAM_IDLE_TIMEOUT))
+            , thread_id
+            , timeout
+        )
+    except RunStreamUnavailable as e:
+        logger.warning(f"Run streaming unavailable, falling back to polling: {e}")
+    run=find_active_run(thread_id, assistant_id)
+    if run:
+        logger.info(f"Resuming wait on active run {run.id} created by the interrupted stream")
+        return wait_for_run(thread_id, run.id, timeout)
+    run=client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id)
+    return wait_for_run(thread_id, run.id, timeout)
+
+def submit_tool_outputs_and_wait(thread_id: str, run_id: str, tool_outputs: List[Dict[str, str]], timeout: float=RUN_WAIT_TIMEOUT):
+    try:
+        return consume_run_stream(
+              client.beta.threads.runs.submit_tool_outputs_stream(thread_id=thread_id, run_id=run_id, tool_outputs=tool_outputs, timeout=min(timeout, RUN_STREAM_IDLE_TIMEOUT))
+            , thread_id
+            , timeout
+            , run_id=run_id
+        )
+    except RunStreamUnavailable as e:
+        logger.warning(f"Tool output streaming unavailable, falling back to polling: {e}")
+    client.beta.threads.runs.submit_tool_outputs(thread_id=thread_id, run_id=run_id, tool_outputs=tool_outputs)
+    return wait_for_run(thread_id, run_id, timeout)
@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from config import set_llm_budget
+from run_agent import run_agent, resume_agent
+from session_memory import SessionMemory
+from storage.session_checkpoints import SessionCheckpointStore
+from user_intent_profile.models import UserIntentProfile
+from user_intent_profile.user_intent_profile import IntentClarifier, FIRST_AGENT_MSG
+from web_search.functions import SEARCH_FAN_OUT
+from retrieval.prefetch import discard_prefetcher
+from utils import logger
+
+SERVICE_HOST='127.0.0.1'
+SERVICE_PORT=8080
+SERVICE_THREAD_POOL=64
+SERVICE_LLM_CONCURRENCY=32
+SESSION_TTL_SECONDS=3600
+SESSION_SWEEP_INTERVAL=60
+
+def sse_event(data, event: Optional[str]=None) -> bytes:
+    lines=[f'event: {event}'] if event else []
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return ('\n'.join(lines)+'\n\n').encode('utf-8')
+
+async def read_json(request: web.Request) -> Dict:
+    if not request.can_read_body:
+        return {}
+    try:
+        body=await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text='Request body is not valid JSON')
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text='Request body must be a JSON object')
+    return body
+
+class ServiceSession:
+    def __init__(self, profile: Optional[UserIntentProfile]=None):
+        self.memory=SessionMemory()
+        self.session_id=self.memory.session_id
+        self.profile=profile
+        self.clarifier: Optional[IntentClarifier]=None
+        self.status='ready' if profile else 'clarifying'
+        self.answer: Optional[str]=None
+        self.task: Optional[asyncio.Task]=None
+        self.lock=asyncio.Lock()
+        self.last_active=time.monotonic()
+
+    def touch(self) -> None:
+        self.last_active=time.monotonic()
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return {'session_id':self.session_id, 'status':self.status}
+
+class AgentService:
+    def __init__(self, fan_out: bool=SEARCH_FAN_OUT):
+        self.fan_out=fan_out
+        self.sessions: Dict[str, ServiceSession]={}
+
+    def get_session(self, request: web.Request) -> ServiceSession:
+        session=self.sessions.get(request.match_info['session_id'])
+        if not session:
+            raise web.HTTPNotFound(text='Unknown session')
+        session.touch()
+        return session
+
+    async def create_session(self, request: web.Request) -> web.Response:
+        body=await read_json(request)
+        if body.get('profile'):
+            try:
+                profile=UserIntentProfile(**body['profile'])
+            except (TypeError, ValueError) as e:
+                raise web.HTTPBadRequest(text=f'Invalid profile: {e}')
+            profile.system_workflow.is_profile_complete=True
+            session=ServiceSession(profile=profile)
+            message=None
+        else:
+            session=ServiceSession()
+            session.clarifier=await asyncio.to_thread(IntentClarifier, session.session_id)
+            message=FIRST_AGENT_MSG
+        self.sessions[session.session_id]=session
+        logger.info(f"Started session {session.session_id} ({len(self.sessions)} active)")
+        return web.json_response({**session.to_dict(), 'message':message}, status=201)
+
+    async def describe_session(self, request: web.Request) -> web.Response:
+        return web.json_response(self.get_session(request).to_dict())
+
+    async def submit_turn(self, request: web.Request) -> web.Response:
+        session=self.get_session(request)
+        if session.status!='clarifying':
+            raise web.HTTPConflict(text=f"Session is '{session.status}', not accepting clarification turns")
+        message=(await read_json(request)).get('message')
+        message=message.strip() if isinstance(message, str) else None
+        if not message:
+            raise web.HTTPBadRequest(text='Missing message')
+        async with session.lock:
+            reply=await asyncio.to_thread(session.clarifier.submit_turn, message)
+            if session.clarifier.is_complete:
+                session.profile=session.clarifier.profile
+                session.status='ready'
+        return web.json_response({**session.to_dict(), 'message':reply})
+
+    async def stream_answer(self, request: web.Request) -> web.StreamResponse:
+        session=self.get_session(request)
+        if session.status not in ('ready', 'answered'):
+            raise web.HTTPConflict(text=f"Session is '{session.status}', answer not available")
+        answered=session.status=='answered'
+        if not answered:
+            session.status='generating'
+
+        response=web.StreamResponse(headers={'Content-Type':'text/event-stream', 'Cache-Control':'no-cache'})
+        try:
+            await response.prepare(request)
+        except Exception:
+            if not answered:
+                session.status='ready'
+            raise
+        if answered:
+            await response.write(sse_event(session.answer or ''))
+            await response.write(sse_event(session.to_dict(), event='done'))
+            await response.write_eof()
+            return response
+
+        loop=asyncio.get_running_loop()
+        tokens: asyncio.Queue=asyncio.Queue()
+        on_token=lambda token: loop.call_soon_threadsafe(tokens.put_nowait, token)
+        try:
+            checkpoint=await asyncio.to_thread(SessionCheckpointStore(session.session_id).load)
+        except Exception:
+            session.status='ready'
+            raise
+        if checkpoint:
+            logger.info(f"Session {session.session_id} resuming from checkpoint stage '{checkpoint.stage}'")
+            agent_run=resume_agent(session.session_id, fan_out=self.fan_out, on_token=on_token)
+        else:
+            agent_run=run_agent(fan_out=self.fan_out, profile=session.profile, session=session.memory, on_token=on_token)
+        session.task=asyncio.create_task(agent_run)
+        session.task.add_done_callback(lambda task: self.finish_generation(session, task))
+        session.task.add_done_callback(lambda _: tokens.put_nowait(None))
+        while True:
+            token=await tokens.get()
+            if token is None:
+                break
+            await response.write(sse_event(token))
+        if session.status=='answered':
+            await response.write(sse_event(session.to_dict(), event='done'))
+        else:
+            error=session.task.exception() if not session.task.cancelled() else None
+            await response.write(sse_event({**session.to_dict(), 'error':str(error or 'Generation cancelled')}, event='error'))
+        await response.write_eof()
+        return response
+
+    def finish_generation(self, session: ServiceSession, task: asyncio.Task) -> None:
+        if task.cancelled():
+            session.status='ready'
+        elif task.exception():
+            logger.error(f"Session {session.session_id} failed: {task.exception()}")
+            session.status='ready'
+        else:
+            session.answer=task.result()
+            session.status='answered'
+        session.touch()
+
+    async def drop_session(self, session_id: str) -> None:
+        self.sessions.pop(session_id, None)
+        discard_prefetcher(session_id)
+        await asyncio.to_thread(SessionCheckpointStore(session_id).clear)
+
+    async def delete_session(self, request: web.Request) -> web.Response:
+        session=self.get_session(request)
+        if session.status=='generating':
+            raise web.HTTPConflict(text='Session is generating an answer')
+        await self.drop_session(session.session_id)
+        return web.Response(status=204)
+
+    async def sweep_sessions(self) -> None:
+        while True:
+            await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+            cutoff=time.monotonic()-SESSION_TTL_SECONDS
+            expired=[sid for sid, s in self.sessions.items() if s.last_active < cutoff and s.status!='generating']
+            for session_id in expired:
+                await self.drop_session(session_id)
+            if expired:
+                logger.info(f"Expired {len(expired)} idle session(s) and their checkpoints")
+
+def create_app(fan_out: bool=SEARCH_FAN_OUT, thread_pool: int=SERVICE_THREAD_POOL, llm_concurrency: int=SERVICE_LLM_CONCURRENCY) -> web.Application:
+    service=AgentService(fan_out=fan_out)
+    app=web.Application()
+    app.add_routes([
+          web.post('/sessions', service.create_session)
+        , web.get('/sessions/{session_id}', service.describe_session)
+        , web.post('/sessions/{session_id}/turns', service.submit_turn)
+        , web.get('/sessions/{session_id}/answer', service.stream_answer)
+        , web.delete('/sessions/{session_id}', service.delete_session)
+    ])
+
+    async def background(app: web.Application):
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=thread_pool))
+        set_llm_budget(threading.BoundedSemaphore(llm_concurrency))
+        sweeper=asyncio.create_task(service.sweep_sessions())
+        yield
+        sweeper.cancel()
+
+    app.cleanup_ctx.append(background)
+    return app
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Serve the research agent over HTTP.')
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--thread-pool', type=int, default=SERVICE_THREAD_POOL)
+    parser.add_argument('--llm-concurrency', type=int, default=SERVICE_LLM_CONCURRENCY)
+    parser.add_argument('--fan-out', action='store_true', default=SEARCH_FAN_OUT)
+    args=parser.parse_args()
+    web.run_app(create_app(args.fan_out, args.thread_pool, args.llm_concurrency), host=args.host, port=args.port)
@@ -1,9 +1,47 @@
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
+from contextlib import contextmanager
+from contextvars import ContextVar
+from uuid import uuid4
 from config import client
 from user_intent_profile.models import UserIntentProfile
 
+def build_profile_query(profile: Optional[UserIntentProfile]) -> Optional[str]:
+    if not profile or not profile.research_focus:
+        return None
+    parts = []
+
+    if profile.customer_profile:
+        if profile.customer_profile.corporate_function:
+            parts.append(f"Corporate Function: {profile.customer_profile.corporate_function}")
+        if profile.customer_profile.product_area:
+            parts.append(f"Product Area: {profile.customer_profile.product_area}")
+        if profile.customer_profile.job_focus:
+            parts.append(f"Job Focus(es): {', '.join(profile.customer_profile.job_focus)}")
+
+    all_companies = []
+    all_markets = []
+    all_capabilities = []
+
+    for rf in profile.research_focus:
+        if rf.target_companies:
+            all_companies += [tc.name for tc in rf.target_companies if tc.name]
+        if rf.target_market:
+            all_markets.append(rf.target_market)
+        if rf.target_capabilities:
+            all_capabilities += rf.target_capabilities
+
+    if all_companies:
+        parts.append(f"Target Company(s): {', '.join(sorted(set(all_companies)))}")
+    if all_markets:
+        parts.append(f"Target Market(s): {', '.join(sorted(set(all_markets)))}")
+    if all_capabilities:
+        parts.append(f"Target Capabilities: {', '.join(sorted(set(all_capabilities)))}")
+
+    return " | ".join(parts)
+
 class SessionMemory(BaseModel):
+    session_id: str=Field(default_factory=lambda: str(uuid4()))
     user_intent_profile: Optional[UserIntentProfile]=None
     profile_query: Optional[str]=None
     fallback_rationale: List[Dict[str, str | int]] = Field(default_factory=list)
@@ -52,39 +90,7 @@ class SessionMemory(BaseModel):
         return self.selected_clusters[-1]['cluster_ids']
 
     def get_profile_query(self) -> Optional[str]:
-        profile = self.load_user_intent_profile()
-        if not profile or not profile.research_focus:
-            return None
-        parts = []
-    
-        if profile.customer_profile:
-            if profile.customer_profile.corporate_function:
-                parts.append(f"Corporate Function: {profile.customer_profile.corporate_function}")
-            if profile.customer_profile.product_area:
-                parts.append(f"Product Area: {profile.customer_profile.product_area}")
-            if profile.customer_profile.job_focus:
-                parts.append(f"Job Focus(es): {', '.join(profile.customer_profile.job_focus)}")
-    
-        all_companies = []
-        all_markets = []
-        all_capabilities = []
-    
-        for rf in profile.research_focus:
-            if rf.target_companies:
-                all_companies += [tc.name for tc in rf.target_companies if tc.name]
-            if rf.target_market:
-                all_markets.append(rf.target_market)
-            if rf.target_capabilities:
-                all_capabilities += rf.target_capabilities
-    
-        if all_companies:
-            parts.append(f"Target Company(s): {', '.join(sorted(set(all_companies)))}")
-        if all_markets:
-            parts.append(f"Target Market(s): {', '.join(sorted(set(all_markets)))}")
-        if all_capabilities:
-            parts.append(f"Target Capabilities: {', '.join(sorted(set(all_capabilities)))}")
-    
-        return " | ".join(parts)
+        return build_profile_query(self.load_user_intent_profile())
 
     def load_profile_query(self) -> str:
         if self.profile_query:
@@ -93,4 +99,23 @@ class SessionMemory(BaseModel):
             self.profile_query=self.get_profile_query()
             return self.profile_query
 
-session_memory=SessionMemory()
\ No newline at end of file
+default_session=SessionMemory()
+current_session: ContextVar[SessionMemory]=ContextVar('current_session', default=default_session)
+
+def get_session_memory() -> SessionMemory:
+    return current_session.get()
+
+@contextmanager
+def use_session(session: Optional[SessionMemory]=None):
+    session=session or SessionMemory()
+    token=current_session.set(session)
+    try:
+        yield session
+    finally:
+        current_session.reset(token)
+
+class SessionMemoryProxy:
+    def __getattr__(self, name: str) -> Any:
+        return getattr(current_session.get(), name)
+
+session_memory=SessionMemoryProxy()
@@ -0,0 +1,44 @@
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+class CrawlState(BaseModel):
+    domain: str
+    seen_urls: Optional[Dict[str, Any]]=None
+    frontier: List[Dict[str, Any]]=Field(default_factory=list)
+    downloads: List[Dict[str, Any]]=Field(default_factory=list)
+    processed_downloads: List[str]=Field(default_factory=list)
+    discovery_complete: bool=False
+    updated_at: Optional[str]=None
+
+class CrawlStateStore:
+    def __init__(self, domain: str):
+        project_root = Path(__file__).resolve().parents[1]
+        safe_domain = re.sub(r'[^A-Za-z0-9._-]', '_', domain.lower())
+        self.domain = domain
+        self.path = project_root / 'storage' / 'crawl_state' / f'{safe_domain}.json'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def load(self) -> Optional[CrawlState]:
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return None
+        with self.path.open('r', encoding='utf-8') as f:
+            try:
+                return CrawlState(**json.load(f))
+            except (json.JSONDecodeError, ValueError):
+                return None
+
+    def save(self, state: CrawlState) -> None:
+        state.updated_at = datetime.now().isoformat(timespec='seconds')
+        tmp_path = self.path.with_suffix('.json.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump(state.model_dump(), f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if self.path.exists():
+            self.path.unlink()
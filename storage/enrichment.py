@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from storage.models import KnowledgeBaseRecord, TopicDigest, extract_named_entities
+from utils import logger
+
+DIGEST_TOKEN_BUDGET=12000
+ENRICHMENT_WORKERS=8
+FALLBACK_SUMMARY_CHARS=500
+
+def truncate_to_token_budget(text: str, token_budget: int=DIGEST_TOKEN_BUDGET) -> str:
+    words=text.split()
+    max_words=int(token_budget/1.3)
+    if len(words) <= max_words:
+        return text
+    return ' '.join(words[:max_words])
+
+def build_enrichment_text(record: KnowledgeBaseRecord) -> str:
+    if record.paragraph_clusters:
+        return '\n'.join(cluster.text for cluster in record.paragraph_clusters)
+    return ' '.join(part for part in (record.title, record.snippet) if part)
+
+def fallback_topic_digest(record: KnowledgeBaseRecord, text: str) -> TopicDigest:
+    return TopicDigest(
+          record_id=record.record_id
+        , topic=record.title or record.url_domain
+        , summary=(record.snippet or text)[:FALLBACK_SUMMARY_CHARS]
+    )
+
+def enrich_records(records: List[KnowledgeBaseRecord], token_budget: int=DIGEST_TOKEN_BUDGET) -> None:
+    pending=[r for r in records if r.topic_digest is None or r.named_entities is None]
+    if not pending:
+        return
+    texts={r.record_id: build_enrichment_text(r) for r in pending}
+
+    def run_ner() -> None:
+        ner_records=[r for r in pending if r.named_entities is None and texts[r.record_id]]
+        if not ner_records:
+            return
+        try:
+            for record, entities in zip(ner_records, extract_named_entities([texts[r.record_id] for r in ner_records])):
+                record.named_entities=entities
+        except Exception as e:
+            logger.error(f"Failed to extract entities in batch: {e}")
+
+    def run_digest(record: KnowledgeBaseRecord) -> None:
+        text=texts[record.record_id]
+        if text:
+            record.get_topic_digest(truncate_to_token_budget(text, token_budget))
+        if record.topic_digest is None:
+            logger.warning(f"Using fallback topic digest for url: {record.url}")
+            record.topic_digest=fallback_topic_digest(record, text)
+
+    with ThreadPoolExecutor(max_workers=ENRICHMENT_WORKERS) as executor:
+        ner_future=executor.submit(run_ner)
+        digest_futures=[executor.submit(run_digest, r) for r in pending if r.topic_digest is None]
+        for future in digest_futures + [ner_future]:
+            future.result()
+    logger.info(f"Enriched {len(pending)} record(s) with topic digests and named entities.")
@@ -0,0 +1,48 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from storage.models import KnowledgeBaseRecord
+from utils import hamming_distance
+
+SIMHASH_MAX_DISTANCE=3
+SIMHASH_BANDS=4
+SIMHASH_BAND_BITS=16
+
+class FingerprintIndex:
+    def __init__(self):
+        self.by_content_hash: Dict[str, str]={}
+        self.simhashes: Dict[str, int]={}
+        self.page_counts: Dict[str, Optional[int]]={}
+        self.urls: Dict[str, str]={}
+        self.bands: List[Dict[int, List[str]]]=[defaultdict(list) for _ in range(SIMHASH_BANDS)]
+
+    def add(self, record: KnowledgeBaseRecord) -> None:
+        self.urls[record.record_id]=record.url
+        self.page_counts[record.record_id]=record.page_count
+        if record.content_hash:
+            self.by_content_hash.setdefault(record.content_hash, record.record_id)
+        if record.simhash:
+            value=int(record.simhash, 16)
+            self.simhashes[record.record_id]=value
+            for band, key in enumerate(self.band_keys(value)):
+                self.bands[band][key].append(record.record_id)
+
+    def band_keys(self, value: int) -> List[int]:
+        mask=(1 << SIMHASH_BAND_BITS)-1
+        return [(value >> (band*SIMHASH_BAND_BITS)) & mask for band in range(SIMHASH_BANDS)]
+
+    def find_duplicate(self, content_hash: Optional[str], simhash: Optional[str], page_count: Optional[int]=None, exclude_url: Optional[str]=None) -> Optional[Tuple[str, str]]:
+        if content_hash:
+            record_id=self.by_content_hash.get(content_hash)
+            if record_id and self.urls.get(record_id)!=exclude_url:
+                return record_id, 'content_hash'
+        if simhash and page_count:
+            value=int(simhash, 16)
+            candidates=set()
+            for band, key in enumerate(self.band_keys(value)):
+                candidates.update(self.bands[band].get(key, []))
+            for record_id in candidates:
+                if self.urls.get(record_id)==exclude_url or self.page_counts.get(record_id)!=page_count:
+                    continue
+                if hamming_distance(value, self.simhashes[record_id]) <= SIMHASH_MAX_DISTANCE:
+                    return record_id, 'simhash'
+        return None
@@ -1,7 +1,14 @@
+import fcntl
 import json
+import os
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterator, List
-from storage.models import KnowledgeBaseRecord
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+from storage.models import KnowledgeBaseRecord, ParagraphCluster
+
+KB_COMMIT_BATCH_SIZE = 10
+CLUSTER_INDEX_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Tuple[KnowledgeBaseRecord, ParagraphCluster]]]] = {}
+SNAPSHOT_CACHE: Dict[str, Tuple[Tuple[int, int], List[KnowledgeBaseRecord]]] = {}
 
 class KnowledgeBase:
     def __init__(self):
@@ -9,12 +16,27 @@ class KnowledgeBase:
         self.path = project_root / 'storage' / 'knowledge_base.json'
         self.path.parent.mkdir(parents=True, exist_ok=True)
         self.path.touch(exist_ok=True)
+        self.lock_path = self.path.with_suffix('.json.lock')
+
+    @contextmanager
+    def write_lock(self):
+        with self.lock_path.open('w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
 
     def save_records(self, records: list[KnowledgeBaseRecord]) -> None:
-        existing = self.load_all()
-        combined = existing + records
-        with self.path.open('w', encoding='utf-8') as f:
-            json.dump([r.model_dump() for r in combined], f, ensure_ascii=False, indent=2)
+        with self.write_lock():
+            existing = self.load_all()
+            self.overwrite_all(existing + records)
+
+    def upsert_records(self, records: list[KnowledgeBaseRecord]) -> None:
+        replaced_urls = {r.url for r in records}
+        with self.write_lock():
+            existing = [r for r in self.load_all() if r.url not in replaced_urls]
+            self.overwrite_all(existing + records)
 
     def load_all(self) -> list[KnowledgeBaseRecord]:
         if self.path.stat().st_size == 0:
@@ -38,10 +60,17 @@ class KnowledgeBase:
 
     def contains_url(self, url: str) -> bool:
         for record in self.iter_records():
-            if record.url == url:
+            if record.url == url or url in (record.alternate_urls or []):
                 return True
         return False
 
+    def get_known_urls(self) -> Set[str]:
+        urls = set()
+        for record in self.load_snapshot():
+            urls.add(record.url)
+            urls.update(record.alternate_urls or [])
+        return urls
+
     def get_by_url(self, url: str) -> KnowledgeBaseRecord | None:
         for record in self.iter_records():
             if record.url == url:
@@ -51,13 +80,55 @@ class KnowledgeBase:
     def get_by_record_ids(self, record_ids: List[str]) -> List[KnowledgeBaseRecord]:
         return [record for record in self.iter_records() if record.record_id in record_ids]
 
+    def file_version(self) -> Tuple[int, int]:
+        stat = self.path.stat()
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load_snapshot(self) -> List[KnowledgeBaseRecord]:
+        version = self.file_version()
+        cached = SNAPSHOT_CACHE.get(str(self.path))
+        if cached and cached[0] == version:
+            return cached[1]
+        records = self.load_all()
+        SNAPSHOT_CACHE[str(self.path)] = (version, records)
+        return records
+
+    def get_cluster_index(self) -> Dict[str, Tuple[KnowledgeBaseRecord, ParagraphCluster]]:
+        version = self.file_version()
+        cached = CLUSTER_INDEX_CACHE.get(str(self.path))
+        if cached and cached[0] == version:
+            return cached[1]
+        index = {}
+        for record in self.load_snapshot():
+            for cluster in record.paragraph_clusters or []:
+                index[cluster.cluster_id] = (record, cluster)
+        CLUSTER_INDEX_CACHE[str(self.path)] = (version, index)
+        return index
+
+    def get_clusters_by_ids(self, cluster_ids: Iterable[str]) -> List[Tuple[KnowledgeBaseRecord, ParagraphCluster]]:
+        index = self.get_cluster_index()
+        return [index[cluster_id] for cluster_id in dict.fromkeys(cluster_ids) if cluster_id in index]
+
+    def add_alternate_urls(self, alternates: dict[str, list[str]]) -> None:
+        with self.write_lock():
+            records = self.load_all()
+            for record in records:
+                if record.record_id in alternates:
+                    urls = set(record.alternate_urls or [])
+                    urls.update(u for u in alternates[record.record_id] if u != record.url)
+                    record.alternate_urls = sorted(urls)
+            self.overwrite_all(records)
+
     def delete_by_url(self, url: str) -> None:
-        all_records = [r for r in self.load_all() if r.url != url]
-        self.overwrite_all(all_records)
+        with self.write_lock():
+            all_records = [r for r in self.load_all() if r.url != url]
+            self.overwrite_all(all_records)
 
     def overwrite_all(self, records: list[KnowledgeBaseRecord]) -> None:
-        with self.path.open('w', encoding='utf-8') as f:
+        tmp_path = self.path.with_suffix(f'.json.{os.getpid()}.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
             json.dump([r.model_dump() for r in records], f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
 
     def save_if_new(self, record: KnowledgeBaseRecord) -> bool:
         if not self.contains_url(record.url):
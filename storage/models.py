@@ -1,7 +1,8 @@
 from pydantic import BaseModel, Field
 from uuid import uuid4
-from typing import List, Optional
-from utils import embed_text, logger
+from typing import List, Optional, Generator, Tuple, Iterable, TYPE_CHECKING
+from utils import embed_text, logger, simhash
+from html_parsing import segment_html
 from bs4 import BeautifulSoup
 from io import BytesIO
 from playwright.async_api import async_playwright
@@ -10,11 +11,193 @@ from config import client
 from datetime import datetime
 from urllib.parse import urlparse
 
+import os
+import re
+import asyncio
+import threading
+import hashlib
 import requests
 import json
+import tempfile
 import fitz
-import spacy
-nlp=spacy.load('en_core_web_sm')
+
+if TYPE_CHECKING:
+    from storage.fingerprint_index import FingerprintIndex
+
+PDF_PAGE_WINDOW=10
+FINGERPRINT_PAGES=3
+FINGERPRINT_MIN_WORDS=50
+CLUSTER_MIN_TOKENS=80
+CLUSTER_TARGET_TOKENS=400
+CLUSTER_MAX_TOKENS=800
+NER_MODEL='en_core_web_sm'
+NER_EXCLUDED_COMPONENTS=['tagger', 'parser', 'attribute_ruler', 'lemmatizer', 'senter']
+NER_LABELS={'ORG'}
+NER_CHUNK_CHARS=100000
+NER_BATCH_SIZE=16
+PDF_HEADERS={
+    "User-Agent": "Mozilla/5.0",
+    "Accept": "application/pdf,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
+}
+
+nlp=None
+nlp_lock=threading.Lock()
+
+def get_nlp():
+    global nlp
+    if nlp is None:
+        with nlp_lock:
+            if nlp is None:
+                import spacy
+                nlp=spacy.load(NER_MODEL, exclude=NER_EXCLUDED_COMPONENTS)
+    return nlp
+
+def chunk_text(text: str, chunk_chars: int=NER_CHUNK_CHARS) -> List[str]:
+    chunks=[]
+    start=0
+    while start < len(text):
+        end=min(start+chunk_chars, len(text))
+        if end < len(text):
+            boundary=text.rfind('\n', start, end)
+            if boundary <= start:
+                boundary=text.rfind(' ', start, end)
+            if boundary > start:
+                end=boundary
+        chunks.append(text[start:end])
+        start=end
+    return chunks
+
+def extract_named_entities(texts: Iterable[str], batch_size: int=NER_BATCH_SIZE) -> List[List[str]]:
+    texts=list(texts)
+    chunks=[(chunk, idx) for idx, text in enumerate(texts) for chunk in chunk_text(text or '')]
+    entities=[set() for _ in texts]
+    for doc, idx in get_nlp().pipe(chunks, as_tuples=True, batch_size=batch_size):
+        entities[idx].update(ent.text.strip() for ent in doc.ents if ent.label_ in NER_LABELS)
+    return [list(found) for found in entities]
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text.split())*1.3)
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+', text) if sentence]
+
+class ClusterNormalizer:
+    def __init__(self, min_tokens: int=CLUSTER_MIN_TOKENS, target_tokens: int=CLUSTER_TARGET_TOKENS, max_tokens: int=CLUSTER_MAX_TOKENS):
+        self.min_tokens=min_tokens
+        self.target_tokens=target_tokens
+        self.max_tokens=max_tokens
+        self.sections_in=0
+        self.clusters_out=0
+        self.merged=0
+        self.split=0
+
+    def split_section(self, heading: str, text: str) -> List[Tuple[str, str]]:
+        if estimate_tokens(text) <= self.max_tokens:
+            return [(heading, text)]
+        self.split+=1
+        pieces=[]
+        current=[]
+        current_tokens=0
+        for sentence in split_sentences(text):
+            words=sentence.split()
+            while estimate_tokens(' '.join(words)) > self.target_tokens:
+                cut=int(self.target_tokens/1.3)
+                if current:
+                    pieces.append(' '.join(current))
+                    current, current_tokens=[], 0
+                pieces.append(' '.join(words[:cut]))
+                words=words[cut:]
+            sentence=' '.join(words)
+            if not sentence:
+                continue
+            sentence_tokens=len(words)*1.3
+            if current and current_tokens+sentence_tokens > self.target_tokens:
+                pieces.append(' '.join(current))
+                current, current_tokens=[], 0
+            current.append(sentence)
+            current_tokens+=sentence_tokens
+        if current:
+            pieces.append(' '.join(current))
+        return [(heading, piece) for piece in pieces]
+
+    def normalize(self, sections: Iterable[Tuple[str, str]]) -> Generator[List[Tuple[str, str]], None, None]:
+        buffer: List[Tuple[str, str]]=[]
+        buffer_tokens=0
+        for heading, text in sections:
+            self.sections_in+=1
+            for piece in self.split_section(heading, text):
+                piece_tokens=estimate_tokens(f'{piece[0]} {piece[1]}')
+                small=buffer_tokens < self.min_tokens or piece_tokens < self.min_tokens
+                if buffer and small and buffer_tokens+piece_tokens <= self.target_tokens:
+                    buffer.append(piece)
+                    buffer_tokens+=piece_tokens
+                    self.merged+=1
+                    continue
+                if buffer:
+                    self.clusters_out+=1
+                    yield buffer
+                buffer=[piece]
+                buffer_tokens=piece_tokens
+        if buffer:
+            self.clusters_out+=1
+            yield buffer
+
+    def log_summary(self, url: str, fact_extraction: bool) -> None:
+        saved=max(0, self.sections_in-self.clusters_out)
+        extraction=f' and {saved} fact-extraction' if fact_extraction else ''
+        logger.info(
+            f"Cluster normalization for '{url}': {self.sections_in} sections -> {self.clusters_out} clusters "
+            f"({self.merged} merged, {self.split} split; {saved} embedding{extraction} calls saved)"
+        )
+
+def iter_markdown_sections(lines: Iterable[str]) -> Generator[Tuple[str, str], None, None]:
+    heading=''
+    body=[]
+    for line in lines:
+        stripped=line.strip()
+        if stripped.startswith('#'):
+            if heading or body:
+                yield heading, ' '.join(body)
+            heading=stripped.lstrip('#').strip()
+            body=[]
+        elif stripped:
+            body.append(stripped)
+    if heading or body:
+        yield heading, ' '.join(body)
+
+def is_probable_table_of_contents(text: str) -> bool:
+    lowered = text.lower()
+    if any(k in lowered for k in ['table of contents', 'contents', 'index']):
+        return True
+    lines = text.split('\n')
+    if len(lines) > 10:
+        digit_lines = sum(1 for l in lines if any(char.isdigit() for char in l))
+        if digit_lines / len(lines) > 0.6:
+            return True
+    if text.count("...") > 10:
+        return True
+    return False
+
+def download_pdf_to_tempfile(url: str, chunk_size: int=1 << 16) -> Optional[Tuple[str, str]]:
+    def stream_to_file(response) -> Tuple[str, str]:
+        content_hash = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    f.write(chunk)
+                    content_hash.update(chunk)
+            return f.name, content_hash.hexdigest()
+
+    with requests.get(url, headers=PDF_HEADERS, timeout=15, stream=True) as response:
+        if "application/pdf" in response.headers.get("Content-Type", "").lower():
+            return stream_to_file(response)
+        soup = BeautifulSoup(response.text, "html.parser")
+    embed = soup.find("embed", {"type": "application/pdf"})
+    if embed and embed.get("src"):
+        with requests.get(embed["src"], headers=PDF_HEADERS, timeout=15, stream=True) as pdf_resp:
+            if "application/pdf" in pdf_resp.headers.get("Content-Type", "").lower():
+                return stream_to_file(pdf_resp)
+    return None
 
 class ExtractedFact(BaseModel):
     fact_id: str=Field(default_factory=lambda: str(uuid4()))
@@ -110,13 +293,12 @@ class KnowledgeBaseRecord(BaseModel):
     paragraph_clusters: Optional[List[ParagraphCluster]]=None
     topic_digest: Optional[TopicDigest]=None
 
-    def get_named_entities(self, main_text: str) -> None:
-        try:
-            doc=nlp(main_text)
-            self.named_entities=list(set(ent.text.strip() for ent in doc.ents if ent.label_ in {"ORG"}))
-        except Exception as e:
-            logger.error(f"Failed to extract entities: {e}")
-    
+    content_hash: Optional[str]=None
+    simhash: Optional[str]=None
+    page_count: Optional[int]=None
+    alternate_urls: Optional[List[str]]=None
+    duplicate_of: Optional[str]=Field(default=None, exclude=True)
+
     def get_topic_digest(self, full_text: str) -> None:
         try:
             response = client.responses.parse(
@@ -171,51 +353,20 @@ class KnowledgeBaseRecord(BaseModel):
         except Exception as e:
             logger.error(f"failed to download/parse url ('{self.url}'): {e}")
             return
-    
-        soup = BeautifulSoup(html, 'html.parser')
-        main_text = soup.get_text(separator=' ', strip=True)
+        await asyncio.to_thread(self.extract_html_clusters, html)
+
+    def extract_html_clusters(self, html: str) -> None:
+        segments = segment_html(html)
+        main_text = segments['text']
         self.word_count = len(main_text.split())
-        self.image_present = bool(soup.find_all('img'))
-    
-        heading_tags = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+        self.image_present = segments['image_present']
+
         paragraph_clusters: List[ParagraphCluster] = []
-        all_elements = soup.find_all(heading_tags + ['p', 'ul', 'ol'])
-        current_heading = None
-        current_cluster = []
-    
-        for el in all_elements:
-            if el.name in heading_tags:
-                if current_heading and current_cluster:
-                    heading = current_heading.get_text(strip=True)
-                    current_clusters = ' '.join(current_cluster)
-                    full_text = f"Heading: {heading}\nText: {current_clusters}"
-                    embedding = embed_text(text=f"{heading} - {current_clusters}")
-                    cluster = ParagraphCluster(
-                          record_id=self.record_id
-                        , text=full_text
-                        , embedding=embedding
-                    )
-                    cluster.get_extracted_facts()
-                    paragraph_clusters.append(cluster)
-                current_heading = el
-                current_cluster = []
-            elif current_heading:
-                if el.name == 'p':
-                    para_text = el.get_text(strip=True)
-                    if para_text:
-                        current_cluster.append(para_text)
-                elif el.name in ['ul', 'ol']:
-                    items = el.find_all('li')
-                    for item in items:
-                        item_text = item.get_text(strip=True)
-                        if item_text:
-                            current_cluster.append(f"-  {item_text}")
-    
-        if current_heading and current_cluster:
-            heading = current_heading.get_text(strip=True)
-            current_clusters = ' '.join(current_cluster)
-            full_text = f"Heading: {heading}\nText: {current_clusters}"
-            embedding = embed_text(text=f"{heading} - {current_clusters}")
+        normalizer = ClusterNormalizer()
+        sections = ((section['heading'], ' '.join(section['items'])) for section in segments['sections'] if section['items'])
+        for parts in normalizer.normalize(sections):
+            full_text = '\n'.join(f"Heading: {heading}\nText: {text}" for heading, text in parts)
+            embedding = embed_text(text=' '.join(f"{heading} - {text}" for heading, text in parts))
             cluster = ParagraphCluster(
                   record_id=self.record_id
                 , text=full_text
@@ -223,78 +374,100 @@ class KnowledgeBaseRecord(BaseModel):
             )
             cluster.get_extracted_facts()
             paragraph_clusters.append(cluster)
+        normalizer.log_summary(self.url, fact_extraction=True)
     
         self.paragraph_clusters = paragraph_clusters
-        if main_text:
-            self.get_topic_digest(main_text)
-            self.get_named_entities(main_text)
-
-    def run_pdf_extraction(self) -> None:
-        def is_probable_table_of_contents(text: str) -> bool:
-            lowered = text.lower()
-            if any(k in lowered for k in ['table of contents', 'contents', 'index']):
-                return True
-            lines = text.split('\n')
-            if len(lines) > 10:
-                digit_lines = sum(1 for l in lines if any(char.isdigit() for char in l))
-                if digit_lines / len(lines) > 0.6:
-                    return True
-            if text.count("...") > 10:
-                return True
+
+    def build_pdf_cluster(self, parts: List[Tuple[str, str]]) -> Optional[ParagraphCluster]:
+        full_text = " ".join(f"{heading} {text}".strip() for heading, text in parts).strip()
+        if not full_text:
+            return None
+        cluster = ParagraphCluster(
+            record_id=self.record_id,
+            text=full_text,
+            embedding=embed_text(full_text)
+        )
+        if self.added_by != 'crawler':
+            cluster.get_extracted_facts()
+        return cluster
+
+    def iter_pdf_clusters_from_lines(self, lines: Iterable[str]) -> Generator[ParagraphCluster, None, None]:
+        normalizer = ClusterNormalizer()
+        sections = (
+            (heading, text) for heading, text in iter_markdown_sections(lines)
+            if not is_probable_table_of_contents(f"{heading} {text}".strip())
+        )
+        for parts in normalizer.normalize(sections):
+            cluster = self.build_pdf_cluster(parts)
+            if cluster:
+                yield cluster
+        normalizer.log_summary(self.url, fact_extraction=self.added_by != 'crawler')
+
+    def fingerprint_pdf(self, doc, content_hash: str, fingerprint_index: Optional['FingerprintIndex']=None) -> bool:
+        self.content_hash = content_hash
+        self.page_count = doc.page_count
+        sample_text = ' '.join(doc[i].get_text() for i in range(min(FINGERPRINT_PAGES, doc.page_count)))
+        if len(sample_text.split()) >= FINGERPRINT_MIN_WORDS:
+            self.simhash = format(simhash(sample_text), '016x')
+        if not fingerprint_index:
             return False
-    
+        match = fingerprint_index.find_duplicate(self.content_hash, self.simhash, page_count=self.page_count, exclude_url=self.url)
+        if not match:
+            return False
+        self.duplicate_of, method = match
+        logger.info(f"Skipping duplicate PDF ('{self.url}') of record {self.duplicate_of} (matched by {method})")
+        return True
+
+    def iter_pdf_clusters(self, page_window: int=PDF_PAGE_WINDOW, fingerprint_index: Optional['FingerprintIndex']=None) -> Generator[ParagraphCluster, None, None]:
+        download = download_pdf_to_tempfile(self.url)
+        if not download:
+            logger.error(f"Failed to resolve PDF for url ('{self.url}')")
+            return
+        pdf_path, content_hash = download
+        self.word_count = 0
+        self.image_present = False
+        try:
+            doc = fitz.open(pdf_path)
+            try:
+                if self.fingerprint_pdf(doc, content_hash, fingerprint_index):
+                    return
+                def iter_window_lines() -> Generator[str, None, None]:
+                    for start in range(0, doc.page_count, page_window):
+                        pages = list(range(start, min(start + page_window, doc.page_count)))
+                        md_text = to_markdown(doc, pages=pages)
+                        self.word_count += len(md_text.split())
+                        self.image_present = self.image_present or any(doc[i].get_images() for i in pages)
+                        yield from md_text.splitlines()
+
+                yield from self.iter_pdf_clusters_from_lines(iter_window_lines())
+            finally:
+                doc.close()
+        finally:
+            os.remove(pdf_path)
+
+    def run_pdf_extraction(self, streaming: bool=False, page_window: int=PDF_PAGE_WINDOW, fingerprint_index: Optional['FingerprintIndex']=None) -> None:
+        if streaming:
+            self.paragraph_clusters = list(self.iter_pdf_clusters(page_window=page_window, fingerprint_index=fingerprint_index))
+            return
+
         def resolve_and_download_pdf(url: str) -> Optional[BytesIO]:
-            headers = {
-                "User-Agent": "Mozilla/5.0",
-                "Accept": "application/pdf,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
-            }
-            response = requests.get(url, headers=headers, timeout=15)
+            response = requests.get(url, headers=PDF_HEADERS, timeout=15)
             if "application/pdf" in response.headers.get("Content-Type", "").lower():
                 return BytesIO(response.content)
             soup = BeautifulSoup(response.text, "html.parser")
             embed = soup.find("embed", {"type": "application/pdf"})
             if embed and embed.get("src"):
                 resolved_url = embed["src"]
-                pdf_resp = requests.get(resolved_url, headers=headers, timeout=15)
+                pdf_resp = requests.get(resolved_url, headers=PDF_HEADERS, timeout=15)
                 if "application/pdf" in pdf_resp.headers.get("Content-Type", "").lower():
                     return BytesIO(pdf_resp.content)
             return None
     
         pdf_stream = resolve_and_download_pdf(self.url)
         doc = fitz.open(stream=pdf_stream, filetype='pdf')
+        if self.fingerprint_pdf(doc, hashlib.sha256(pdf_stream.getbuffer()).hexdigest(), fingerprint_index):
+            return
         md_text = to_markdown(doc)
-        paragraph_clusters: List[ParagraphCluster] = []
-        current_cluster = []
         self.word_count = len(md_text.split())
         self.image_present = any(page.get_images() for page in doc)
-    
-        for line in md_text.splitlines():
-            if line.strip().startswith("#"):
-                if current_cluster:
-                    full_text = " ".join(current_cluster).strip()
-                    cluster = ParagraphCluster(
-                        record_id=self.record_id,
-                        text=full_text,
-                        embedding=embed_text(full_text)
-                    )
-                    if self.added_by != 'crawler':
-                        cluster.get_extracted_facts()
-                    paragraph_clusters.append(cluster)
-                current_cluster = [line.strip().lstrip('#').strip()]
-            elif line.strip():
-                current_cluster.append(line.strip())
-        if current_cluster:
-            full_text = " ".join(current_cluster).strip()
-            cluster = ParagraphCluster(
-                record_id=self.record_id,
-                text=full_text,
-                embedding=embed_text(full_text)
-            )
-            if self.added_by != 'crawler':
-                cluster.get_extracted_facts()
-            paragraph_clusters.append(cluster)
-    
-        paragraph_clusters = [c for c in paragraph_clusters if not is_probable_table_of_contents(c.text)]
-        self.paragraph_clusters = paragraph_clusters
-        self.get_named_entities(md_text)
-        self.get_topic_digest(md_text)
\ No newline at end of file
+        self.paragraph_clusters = list(self.iter_pdf_clusters_from_lines(md_text.splitlines()))
\ No newline at end of file
@@ -0,0 +1,46 @@
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+class SessionCheckpoint(BaseModel):
+    session_id: str
+    stage: Optional[str]=None
+    interactive: bool=False
+    memory: Dict[str, Any]=Field(default_factory=dict)
+    record_level_decision: Optional[Dict[str, Any]]=None
+    selected_record_ids: Optional[List[str]]=None
+    cluster_level_decision: Optional[Dict[str, Any]]=None
+    updated_at: Optional[str]=None
+
+class SessionCheckpointStore:
+    def __init__(self, session_id: str, checkpoint_dir: Optional[Path] = None):
+        project_root = Path(__file__).resolve().parents[1]
+        checkpoint_dir = checkpoint_dir or Path(os.getenv('session_checkpoint_dir') or project_root / 'storage' / 'session_checkpoints')
+        safe_id = re.sub(r'[^A-Za-z0-9._-]', '_', session_id)
+        self.session_id = session_id
+        self.path = checkpoint_dir / f'{safe_id}.json'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def load(self) -> Optional[SessionCheckpoint]:
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return None
+        with self.path.open('r', encoding='utf-8') as f:
+            try:
+                return SessionCheckpoint(**json.load(f))
+            except (json.JSONDecodeError, ValueError):
+                return None
+
+    def save(self, checkpoint: SessionCheckpoint) -> None:
+        checkpoint.updated_at = datetime.now().isoformat(timespec='seconds')
+        tmp_path = self.path.with_suffix('.json.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump(checkpoint.model_dump(), f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if self.path.exists():
+            self.path.unlink()
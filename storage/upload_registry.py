@@ -0,0 +1,134 @@
+import fcntl
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+from pydantic import BaseModel
+
+from utils import logger
+
+UPLOAD_VALIDATION_TTL = 3600.0
+VALIDATED_UPLOADS: Dict[str, float] = {}
+
+class UploadHandle(BaseModel):
+    content_hash: str
+    path: str
+    file_id: str
+    uploaded_at: Optional[str]=None
+
+class UploadRegistry:
+    def __init__(self, client, path: Optional[Path] = None):
+        project_root = Path(__file__).resolve().parents[1]
+        self.client = client
+        self.project_root = project_root
+        self.path = path or project_root / 'storage' / 'upload_registry.json'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock_path = self.path.with_suffix('.json.lock')
+        self.handles: Dict[str, UploadHandle] = self.load()
+        self.removed: Set[str] = set()
+
+    @contextmanager
+    def write_lock(self):
+        with self.lock_path.open('w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self) -> Dict[str, UploadHandle]:
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return {}
+        with self.path.open('r', encoding='utf-8') as f:
+            try:
+                return {h['content_hash']: UploadHandle(**h) for h in json.load(f)}
+            except (json.JSONDecodeError, KeyError, ValueError):
+                return {}
+
+    def refresh(self) -> None:
+        handles = {h: handle for h, handle in self.load().items() if h not in self.removed}
+        handles.update(self.handles)
+        self.handles = handles
+
+    def save(self) -> None:
+        with self.write_lock():
+            self.write()
+
+    def write(self) -> None:
+        self.refresh()
+        tmp_path = self.path.with_suffix(f'.json.{os.getpid()}.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump([h.model_dump() for h in self.handles.values()], f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def relative_path(self, file_path: Path) -> str:
+        try:
+            return str(file_path.resolve().relative_to(self.project_root))
+        except ValueError:
+            return str(file_path.resolve())
+
+    def handle_exists(self, handle: UploadHandle) -> bool:
+        validated_at = VALIDATED_UPLOADS.get(handle.file_id)
+        if validated_at is not None and time.monotonic() - validated_at < UPLOAD_VALIDATION_TTL:
+            return True
+        try:
+            self.client.files.retrieve(handle.file_id)
+        except Exception:
+            VALIDATED_UPLOADS.pop(handle.file_id, None)
+            return False
+        VALIDATED_UPLOADS[handle.file_id] = time.monotonic()
+        return True
+
+    def get_file_id(self, file_path: Path) -> str:
+        content_hash = hashlib.sha256(file_path.read_bytes()).hexdigest()
+        handle = self.handles.get(content_hash)
+        if handle and self.handle_exists(handle):
+            return handle.file_id
+        self.handles.pop(content_hash, None)
+        with self.write_lock():
+            self.refresh()
+            handle = self.handles.get(content_hash)
+            if handle and self.handle_exists(handle):
+                return handle.file_id
+            with file_path.open('rb') as f:
+                upload = self.client.files.create(file=f, purpose='assistants')
+            VALIDATED_UPLOADS[upload.id] = time.monotonic()
+            relative_path = self.relative_path(file_path)
+            stale = [h for h in self.handles.values() if h.path == relative_path and h.content_hash != content_hash]
+            for stale_handle in stale:
+                self.delete_handle(stale_handle)
+            self.handles[content_hash] = UploadHandle(
+                  content_hash=content_hash
+                , path=relative_path
+                , file_id=upload.id
+                , uploaded_at=datetime.now().isoformat(timespec='seconds')
+            )
+            self.write()
+        logger.info(f"Uploaded static file '{relative_path}' ({upload.id})")
+        return upload.id
+
+    def delete_handle(self, handle: UploadHandle) -> None:
+        try:
+            self.client.files.delete(handle.file_id)
+        except Exception as e:
+            logger.warning(f"Failed to delete stale upload {handle.file_id}: {e}")
+        VALIDATED_UPLOADS.pop(handle.file_id, None)
+        self.handles.pop(handle.content_hash, None)
+        self.removed.add(handle.content_hash)
+
+    def collect_garbage(self, static_files: Iterable[Path]) -> int:
+        current_hashes = {hashlib.sha256(p.read_bytes()).hexdigest() for p in static_files if p.exists()}
+        with self.write_lock():
+            self.refresh()
+            stale = [h for h in self.handles.values() if h.content_hash not in current_hashes]
+            for handle in stale:
+                self.delete_handle(handle)
+            if stale:
+                self.write()
+        if stale:
+            logger.info(f"Removed {len(stale)} stale upload handle(s).")
+        return len(stale)
@@ -0,0 +1,66 @@
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+class UrlMetadata(BaseModel):
+    url: str
+    kind: Optional[str]=None
+    etag: Optional[str]=None
+    last_modified: Optional[str]=None
+    sitemap_lastmod: Optional[str]=None
+    last_checked: Optional[str]=None
+
+class UrlMetadataStore:
+    def __init__(self, domain: str):
+        project_root = Path(__file__).resolve().parents[1]
+        safe_domain = re.sub(r'[^A-Za-z0-9._-]', '_', domain.lower())
+        self.path = project_root / 'storage' / 'url_metadata' / f'{safe_domain}.json'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.entries: Dict[str, UrlMetadata] = self.load()
+
+    def load(self) -> Dict[str, UrlMetadata]:
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return {}
+        with self.path.open('r', encoding='utf-8') as f:
+            try:
+                return {r['url']: UrlMetadata(**r) for r in json.load(f)}
+            except (json.JSONDecodeError, KeyError, ValueError):
+                return {}
+
+    def save(self) -> None:
+        tmp_path = self.path.with_suffix('.json.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump([m.model_dump() for m in self.entries.values()], f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, url: str) -> Optional[UrlMetadata]:
+        return self.entries.get(url)
+
+    def update(self, url: str, **fields) -> UrlMetadata:
+        entry = self.entries.get(url) or UrlMetadata(url=url)
+        for key, value in fields.items():
+            if value is not None:
+                setattr(entry, key, value)
+        entry.last_checked = datetime.now().isoformat(timespec='seconds')
+        self.entries[url] = entry
+        return entry
+
+    def sitemap_unchanged(self, url: str, lastmod: Optional[str]) -> bool:
+        entry = self.entries.get(url)
+        return bool(lastmod and entry and entry.sitemap_lastmod == lastmod)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        entry = self.entries.get(url)
+        conditional = {}
+        if entry and entry.etag:
+            conditional['If-None-Match'] = entry.etag
+        if entry and entry.last_modified:
+            conditional['If-Modified-Since'] = entry.last_modified
+        return conditional
+
+    def urls_of_kind(self, kind: str) -> List[str]:
+        return [url for url, entry in self.entries.items() if entry.kind == kind]
@@ -1,31 +1,37 @@
 from config import client
-from utils import logger
+from utils import logger, embed_text
 from storage.knowledge_base import KnowledgeBase
 from session_memory import session_memory
+from synthesis.context_compression import compress_clusters, CONTEXT_TOKEN_BUDGET
 
 from typing import Optional
 from collections import defaultdict
 
+import os
 import json
 
-def get_cluster_level_resolution() -> Optional[str]:
-    selected_clusters=session_memory.load_selected_clusters()
-    kb=KnowledgeBase().load_all()
+CONTEXT_COMPRESSION=os.getenv('context_compression', 'true').lower()=='true'
+CONTEXT_USE_FACTS=os.getenv('context_use_facts', 'false').lower()=='true'
+
+def get_cluster_level_resolution(compress: bool=CONTEXT_COMPRESSION, token_budget: int=CONTEXT_TOKEN_BUDGET, use_facts: bool=CONTEXT_USE_FACTS) -> Optional[str]:
+    selected_clusters=session_memory.load_selected_clusters() or []
     rows=[]
-    for record in kb:
-        if not record.paragraph_clusters:
-            continue
-        for cluster in record.paragraph_clusters:
-            if cluster.cluster_id in selected_clusters:
-                rows.append({
-                      'record_id':record.record_id
-                    , 'record_title':record.title
-                    , 'published_date':record.published_date
-                    , 'source_url':record.url
-                    , 'topic_digest':record.topic_digest.summary
-                    , 'cluster_id':cluster.cluster_id
-                    , 'cluster_text':cluster.text
-                })
+    for record, cluster in KnowledgeBase().get_clusters_by_ids(selected_clusters):
+        rows.append({
+              'record_id':record.record_id
+            , 'record_title':record.title
+            , 'published_date':record.published_date
+            , 'source_url':record.url
+            , 'topic_digest':record.topic_digest.summary if record.topic_digest else None
+            , 'cluster_id':cluster.cluster_id
+            , 'cluster_text':cluster.text
+            , 'embedding':cluster.embedding
+            , 'extracted_facts':cluster.extracted_facts
+        })
+    profile_query=session_memory.load_profile_query()
+    query_embedding=embed_text(profile_query) if compress and rows and profile_query else None
+    if query_embedding is not None:
+        rows=compress_clusters(rows, query_embedding, token_budget=token_budget, use_facts=use_facts)
     grouped=defaultdict(list)
     for row in rows:
         grouped[row['record_id']].append(row)
@@ -35,7 +41,7 @@ def get_cluster_level_resolution() -> Optional[str]:
         output.append(f"record_title: {record['record_title']}")
         output.append(f"published_date: {record['published_date'] or 'Unknown'}")
         output.append(f"source_url: {record['source_url']}")
-        output.append(f"record_summary: {record['topic_digest']}")
+        output.append(f"record_summary: {record['topic_digest'] or 'Unknown'}")
         output.append(f"paragraph_clusters:")
         for c in clusters:
             output.append(f"              - cluster_text: {c['cluster_text']}")
@@ -44,7 +50,7 @@ def get_cluster_level_resolution() -> Optional[str]:
 
 def get_cluster_level_decision():
     profile=session_memory.load_user_intent_profile()
-    resolution=get_cluster_level_resolution()
+    resolution=get_cluster_level_resolution(compress=False)
     try:
         response=client.responses.create(
               model='gpt-4.1-mini'
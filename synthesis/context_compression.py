@@ -0,0 +1,72 @@
+from typing import List, Dict, Any, Optional
+
+from storage.models import estimate_tokens
+from utils import logger, cosine_similarity
+
+CONTEXT_TOKEN_BUDGET=6000
+CONTEXT_DUPLICATE_SIMILARITY=0.92
+CONTEXT_MMR_LAMBDA=0.7
+RECORD_HEADER_TOKENS=40
+
+def remove_near_duplicates(rows: List[Dict[str, Any]], threshold: float=CONTEXT_DUPLICATE_SIMILARITY) -> List[Dict[str, Any]]:
+    kept=[]
+    for row in sorted(rows, key=lambda r: r['relevance'], reverse=True):
+        if any(cosine_similarity(row['embedding'], k['embedding']) >= threshold for k in kept):
+            continue
+        kept.append(row)
+    return kept
+
+def rank_by_mmr(rows: List[Dict[str, Any]], mmr_lambda: float=CONTEXT_MMR_LAMBDA) -> List[Dict[str, Any]]:
+    remaining=list(rows)
+    ranked=[]
+    while remaining:
+        def mmr_score(row: Dict[str, Any]) -> float:
+            redundancy=max((cosine_similarity(row['embedding'], r['embedding']) for r in ranked), default=0.0)
+            return mmr_lambda*row['relevance']-(1-mmr_lambda)*redundancy
+        best=max(remaining, key=mmr_score)
+        ranked.append(best)
+        remaining.remove(best)
+    return ranked
+
+def facts_text(row: Dict[str, Any]) -> Optional[str]:
+    facts=row.get('extracted_facts')
+    if not facts:
+        return None
+    return ' '.join(f"{fact.entity}: {fact.claim}" for fact in facts)
+
+def compress_clusters(
+    rows: List[Dict[str, Any]],
+    query_embedding: List[float],
+    token_budget: int=CONTEXT_TOKEN_BUDGET,
+    use_facts: bool=False
+) -> List[Dict[str, Any]]:
+    if not rows:
+        return []
+    tokens_before=sum(estimate_tokens(row['cluster_text']) for row in rows)+RECORD_HEADER_TOKENS*len({r['record_id'] for r in rows})
+    for row in rows:
+        row['relevance']=cosine_similarity(query_embedding, row['embedding'])
+    unique_rows=remove_near_duplicates(rows)
+    ranked=rank_by_mmr(unique_rows)
+
+    selected=[]
+    included_records=set()
+    tokens_after=0
+    for row in ranked:
+        if use_facts:
+            compact=facts_text(row)
+            if compact and estimate_tokens(compact) < estimate_tokens(row['cluster_text']):
+                row['cluster_text']=compact
+        cost=estimate_tokens(row['cluster_text'])
+        if row['record_id'] not in included_records:
+            cost+=RECORD_HEADER_TOKENS
+        if tokens_after+cost > token_budget:
+            continue
+        selected.append(row)
+        included_records.add(row['record_id'])
+        tokens_after+=cost
+
+    logger.info(
+        f"Context compression: {len(rows)} clusters (~{tokens_before} tokens) -> {len(selected)} clusters (~{tokens_after} tokens); "
+        f"{len(rows)-len(unique_rows)} near-duplicates removed, {len(unique_rows)-len(selected)} dropped for the {token_budget}-token budget"
+    )
+    return selected
@@ -1,32 +1,113 @@
-from typing import Optional
+from typing import Optional, Generator, Callable, Tuple, List
 from pathlib import Path
 import io
+import os
 import time
 import json
 
 from synthesis.cluster_level_decision import get_cluster_level_resolution
 from config import client, rg_id
 from session_memory import session_memory
+from storage.upload_registry import UploadRegistry
+from run_waiter import run_and_wait, RunTimeoutError
 from utils import logger
 
-def run_response_generation() -> Optional[str]:
-    profile = session_memory.load_user_intent_profile()
+RESPONSE_STREAMING=os.getenv('response_streaming', 'true').lower()=='true'
+RESPONSE_MODEL='gpt-4.1'
+SYNTHESIS_DIR=Path(__file__).resolve().parent
+
+class ResponseGenerationError(RuntimeError):
+    pass
+
+def get_generation_paths(profile) -> Tuple[Path, Path]:
     corporate_funct = profile.customer_profile.corporate_function.lower()
     output_type=next((output for rf in profile.research_focus if rf.desired_outputs for output in rf.desired_outputs), None)
-    customer_path = Path(f"synthesis/customer_profiles/{corporate_funct}.txt")
-    output_path=Path(f"synthesis/output_instructions/{output_type}.txt")
+    customer_path = SYNTHESIS_DIR / 'customer_profiles' / f'{corporate_funct}.txt'
+    output_path = SYNTHESIS_DIR / 'output_instructions' / f'{output_type}.txt'
+    return customer_path, output_path
+
+def get_static_files() -> List[Path]:
+    return sorted((SYNTHESIS_DIR / 'customer_profiles').glob('*.txt')) + sorted((SYNTHESIS_DIR / 'output_instructions').glob('*.txt'))
+
+def build_generation_input(profile, customer_text: str, output_text: str, resolution: str) -> str:
+    return f"""
+        ## Customer profile
+        {customer_text}
+
+        ## Output instructions
+        {output_text}
+
+        ## User intent profile
+        {json.dumps(profile.model_dump(exclude={'metadata'}, serialize_as_any=True), indent=2)}
+
+        ## Cluster resolution
+        {resolution}
+        """
+
+def stream_response_generation() -> Generator[str, None, None]:
+    profile = session_memory.load_user_intent_profile()
+    customer_path, output_path = get_generation_paths(profile)
+    resolution = get_cluster_level_resolution()
+    generation_input = build_generation_input(
+          profile
+        , customer_text=customer_path.read_text(encoding='utf-8')
+        , output_text=output_path.read_text(encoding='utf-8')
+        , resolution=resolution
+    )
+    start_time = time.perf_counter()
+    first_token_time = None
+    stream = client.responses.create(
+          model=RESPONSE_MODEL
+        , input=generation_input
+        , instructions="""
+            You are a competitive intelligence analyst writing the final answer to the user's research request.
+            Tailor the framing and emphasis to the customer profile, and follow the output instructions exactly for format, length and style.
+            Ground every claim in the cluster resolution. Do not introduce facts that are not supported by it.
+            If the cluster resolution does not cover part of the request, say so plainly instead of guessing.
+            """
+        , stream=True
+    )
+    completed = False
+    for event in stream:
+        if event.type == 'response.output_text.delta':
+            if first_token_time is None:
+                first_token_time = time.perf_counter()
+                logger.info(f'Response generation time to first token: {first_token_time - start_time:.2f} seconds')
+            yield event.delta
+        elif event.type == 'response.completed':
+            completed = True
+        elif event.type in ('response.failed', 'response.incomplete', 'error'):
+            raise ResponseGenerationError(f"Response stream ended with '{event.type}': {event}")
+    if not completed:
+        raise ResponseGenerationError('Response stream ended before the response completed')
+    logger.info(f'Response generation stream completed in {time.perf_counter() - start_time:.2f} seconds')
+
+def run_response_generation(streaming: bool=RESPONSE_STREAMING, on_token: Optional[Callable[[str], None]]=None) -> Optional[str]:
+    if streaming:
+        tokens = []
+        try:
+            for token in stream_response_generation():
+                tokens.append(token)
+                if on_token:
+                    on_token(token)
+        except Exception as e:
+            logger.error(f'Failed to generate response: {e}')
+            return None
+        return ''.join(tokens) or None
+
+    profile = session_memory.load_user_intent_profile()
+    customer_path, output_path = get_generation_paths(profile)
     resolution = get_cluster_level_resolution()
 
     resolution_file = io.BytesIO(resolution.encode('utf-8'))
     resolution_file.name = 'cluster_resolution.txt'
 
-    customer_upload = client.files.create(file=open(customer_path, 'rb'), purpose='assistants')
+    registry = UploadRegistry(client)
+    registry.collect_garbage(get_static_files())
+    customer_file_id = registry.get_file_id(customer_path)
+    output_file_id = registry.get_file_id(output_path)
     resolution_upload = client.files.create(file=resolution_file, purpose='assistants')
-    output_upload=client.files.create(file=open(output_path, 'rb'), purpose='assistants')
-    
-    customer_file_id = customer_upload.id
     resolution_file_id = resolution_upload.id
-    output_file_id=output_upload.id
     
     try:
         thread = client.beta.threads.create()
@@ -45,17 +126,7 @@ def run_response_generation() -> Optional[str]:
                 {'file_id': output_file_id, 'tools': [{'type': 'file_search'}]}
             ]
         )
-        # Start run
-        run = client.beta.threads.runs.create(
-            thread_id=thread.id,
-            assistant_id=rg_id
-        )
-
-        while True:
-            run_status = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id).status
-            if run_status in ['completed', 'failed', 'cancelled']:
-                break
-            time.sleep(0.5)
+        run_status = run_and_wait(thread_id=thread.id, assistant_id=rg_id).status
 
         if run_status == 'completed':
             messages = client.beta.threads.messages.list(thread_id=thread.id)
@@ -63,9 +134,11 @@ def run_response_generation() -> Optional[str]:
         else:
             logger.error(f"Failed to generate response: {run_status}")
             return None
+    except RunTimeoutError as e:
+        logger.error(f"Failed to generate response: {e}")
+        return None
     finally:
-        for fid in [customer_file_id, resolution_file_id, output_file_id]:
-            try:
-                client.files.delete(fid)
-            except Exception as e:
-                logger.error(f"Failed to delete file {fid}: {e}")
\ No newline at end of file
+        try:
+            client.files.delete(resolution_file_id)
+        except Exception as e:
+            logger.error(f"Failed to delete file {resolution_file_id}: {e}")
\ No newline at end of file
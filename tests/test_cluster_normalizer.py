@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip('playwright')
+pytest.importorskip('fitz')
+
+import storage.models as models
+from storage.models import ClusterNormalizer, estimate_tokens, iter_markdown_sections
+
+def words(count, sentence_length=20):
+    sentences=[]
+    for start in range(0, count, sentence_length):
+        sentences.append(' '.join(f'word{i}' for i in range(start, min(count, start+sentence_length)))+'.')
+    return ' '.join(sentences)
+
+def test_small_sections_are_merged_up_to_target():
+    normalizer=ClusterNormalizer(min_tokens=80, target_tokens=400, max_tokens=800)
+    sections=[(f'Heading {i}', words(20)) for i in range(6)]
+    clusters=list(normalizer.normalize(sections))
+    assert len(clusters)==1
+    assert [heading for heading, _ in clusters[0]]==[f'Heading {i}' for i in range(6)]
+    assert normalizer.merged==5 and normalizer.clusters_out==1
+
+def test_large_section_is_split_below_target():
+    normalizer=ClusterNormalizer(min_tokens=80, target_tokens=400, max_tokens=800)
+    clusters=list(normalizer.normalize([('Long', words(1500))]))
+    assert normalizer.split==1
+    assert len(clusters) > 1
+    for cluster in clusters:
+        assert all(estimate_tokens(text) <= 400 for _, text in cluster)
+    rejoined=' '.join(text for cluster in clusters for _, text in cluster)
+    assert rejoined.split()==words(1500).split()
+
+def test_log_summary_never_reports_negative_savings(monkeypatch):
+    messages=[]
+    monkeypatch.setattr(models.logger, 'info', messages.append)
+    normalizer=ClusterNormalizer(min_tokens=80, target_tokens=400, max_tokens=800)
+    list(normalizer.normalize([('Long', words(1500))]))
+    normalizer.log_summary('https://example.com/report.pdf', fact_extraction=True)
+    assert '; 0 embedding and 0 fact-extraction calls saved' in messages[0]
+
+def test_sentence_longer_than_target_is_cut():
+    normalizer=ClusterNormalizer(min_tokens=10, target_tokens=100, max_tokens=150)
+    pieces=normalizer.split_section('Run-on', ' '.join(f'w{i}' for i in range(400)))
+    assert len(pieces) > 1
+    assert all(estimate_tokens(text) <= 100 for _, text in pieces)
+
+def test_mid_sized_sections_pass_through_unchanged():
+    normalizer=ClusterNormalizer(min_tokens=80, target_tokens=400, max_tokens=800)
+    sections=[('A', words(200)), ('B', words(250))]
+    assert list(normalizer.normalize(sections))==[[sections[0]], [sections[1]]]
+    assert normalizer.merged==0 and normalizer.split==0
+
+def test_iter_markdown_sections_groups_body_under_headings():
+    lines=['intro line', '# Title', 'first', '', 'second', '## Sub', 'third']
+    assert list(iter_markdown_sections(lines))==[('', 'intro line'), ('Title', 'first second'), ('Sub', 'third')]
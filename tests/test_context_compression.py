@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('playwright')
+pytest.importorskip('fitz')
+
+from synthesis.context_compression import compress_clusters, rank_by_mmr, remove_near_duplicates, RECORD_HEADER_TOKENS
+
+def row(cluster_id, embedding, relevance=0.0, text='alpha beta gamma', record_id='r1', facts=None):
+    return {
+          'cluster_id':cluster_id
+        , 'record_id':record_id
+        , 'embedding':embedding
+        , 'relevance':relevance
+        , 'cluster_text':text
+        , 'extracted_facts':facts
+    }
+
+def test_remove_near_duplicates_keeps_the_most_relevant_copy():
+    rows=[row('low', [1.0, 0.0], relevance=0.5), row('high', [1.0, 0.01], relevance=0.9), row('other', [0.0, 1.0], relevance=0.1)]
+    assert [r['cluster_id'] for r in remove_near_duplicates(rows)]==['high', 'other']
+
+def test_mmr_prefers_a_diverse_cluster_over_a_redundant_one():
+    rows=[
+          row('best', [1.0, 0.0], relevance=0.90)
+        , row('redundant', [0.95, 0.31], relevance=0.85)
+        , row('diverse', [0.0, 1.0], relevance=0.70)
+    ]
+    assert [r['cluster_id'] for r in rank_by_mmr(rows, mmr_lambda=0.5)]==['best', 'diverse', 'redundant']
+    assert [r['cluster_id'] for r in rank_by_mmr(rows, mmr_lambda=1.0)]==['best', 'redundant', 'diverse']
+
+def test_compress_clusters_respects_token_budget_and_charges_headers_once():
+    text=' '.join(['word']*50)
+    rows=[row(f'c{i}', [1.0, float(i)], text=text, record_id='r1' if i < 2 else 'r2') for i in range(4)]
+    cluster_tokens=int(50*1.3)
+    budget=RECORD_HEADER_TOKENS+2*cluster_tokens
+    selected=compress_clusters(rows, [1.0, 0.0], token_budget=budget)
+    assert len(selected)==2
+    assert {r['record_id'] for r in selected}=={'r1'}
+
+def test_compress_clusters_swaps_in_shorter_facts():
+    fact=SimpleNamespace(entity='Example Co', claim='launched a graph')
+    rows=[row('c1', [1.0, 0.0], text=' '.join(['word']*200), facts=[fact])]
+    selected=compress_clusters(rows, [1.0, 0.0], use_facts=True)
+    assert selected[0]['cluster_text']=='Example Co: launched a graph'
+
+def test_compress_clusters_handles_empty_input():
+    assert compress_clusters([], [1.0, 0.0])==[]
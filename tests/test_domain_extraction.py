@@ -0,0 +1,152 @@
+import asyncio
+from urllib.robotparser import RobotFileParser
+
+import pytest
+
+pytest.importorskip('tldextract')
+pytest.importorskip('playwright')
+pytest.importorskip('fitz')
+
+import admin.domain_extraction.functions as domain_functions
+from storage.url_metadata import UrlMetadata
+from admin.domain_extraction.functions import BloomFilter, CrawlScheduler, HostConcurrencyController, HostRobots, RobotsCache, ScalableBloomFilter, SeenUrlSet
+
+def test_aimd_increases_additively_on_steady_latency():
+    async def run():
+        controller=HostConcurrencyController(host='example.com', initial_limit=4)
+        for _ in range(4):
+            await controller.acquire()
+            await controller.release(latency=0.1, status=200)
+        return controller
+    controller=asyncio.run(run())
+    assert 4.9 < controller.limit < 5.0
+    assert controller.requests==4 and controller.in_flight==0
+
+def test_aimd_halves_once_per_latency_window_on_throttling():
+    async def run():
+        controller=HostConcurrencyController(host='example.com', initial_limit=8)
+        await controller.release(latency=0.1, status=429, retry_after=5)
+        await controller.release(latency=0.1, status=503)
+        return controller
+    controller=asyncio.run(run())
+    assert controller.limit==4
+    assert controller.throttled==2
+    assert controller.next_request_time > 0
+
+def test_aimd_decreases_on_latency_spike_and_respects_floor():
+    controller=HostConcurrencyController(host='example.com', initial_limit=2, min_limit=1)
+    controller.record_latency(0.1)
+    assert controller.limit==2.5
+    controller.record_latency(5.0)
+    assert controller.limit==1.25
+    controller.last_decrease_time=0.0
+    controller.decrease()
+    assert controller.limit==1
+
+def test_aimd_acquire_waits_for_a_free_slot():
+    async def run():
+        controller=HostConcurrencyController(host='example.com', initial_limit=1)
+        await controller.acquire()
+        waiter=asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        await controller.release(latency=0.1, status=200)
+        await asyncio.wait_for(waiter, timeout=1)
+        return controller
+    assert asyncio.run(run()).in_flight==1
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives():
+    bloom=BloomFilter(capacity=2000, error_rate=0.01)
+    added=[f'https://example.com/page/{i}' for i in range(2000)]
+    for url in added:
+        bloom.add(url)
+    assert all(url in bloom for url in added)
+    false_positives=sum(f'https://other.com/page/{i}' in bloom for i in range(10000))
+    assert false_positives/10000 < 0.03
+    assert bloom.false_positive_rate() < 0.02
+
+def test_scalable_bloom_filter_grows_and_round_trips():
+    bloom=ScalableBloomFilter(initial_capacity=100, error_rate=0.01)
+    urls=[f'https://example.com/{i}' for i in range(500)]
+    for url in urls:
+        bloom.add(url)
+    assert len(bloom.filters) > 1
+    assert len(bloom)==500
+    restored=ScalableBloomFilter.from_dict(bloom.to_dict())
+    assert all(url in restored for url in urls)
+    assert len(restored)==500
+
+def test_seen_url_set_keeps_recent_window_and_round_trips():
+    seen=SeenUrlSet(recent_size=3, bloom=ScalableBloomFilter(initial_capacity=100, error_rate=0.01))
+    for i in range(5):
+        seen.add(f'https://example.com/{i}')
+    seen.add('https://example.com/4')
+    assert list(seen.recent)==['https://example.com/2', 'https://example.com/3', 'https://example.com/4']
+    assert len(seen)==5
+    assert all(f'https://example.com/{i}' in seen for i in range(5))
+    restored=SeenUrlSet.from_dict(seen.to_dict(), recent_size=2)
+    assert list(restored.recent)==['https://example.com/3', 'https://example.com/4']
+    assert 'https://example.com/0' in restored
+    assert restored.stats()['urls']==5
+
+def build_robots(lines):
+    parser=RobotFileParser()
+    parser.parse(lines)
+    return HostRobots(parser, ttl=60)
+
+def test_host_robots_memoizes_by_longest_rule_prefix():
+    robots=build_robots(['User-agent: *', 'Allow: /private/press', 'Disallow: /private'])
+    assert robots.prefix_length==len('/private/press')
+    assert not robots.can_fetch('https://example.com/private/a')
+    assert robots.can_fetch('https://example.com/private/press/release.html')
+    assert robots.can_fetch('https://example.com/public/page')
+    calls=[]
+    original=robots.parser.can_fetch
+    robots.parser.can_fetch=lambda agent, url: calls.append(url) or original(agent, url)
+    assert robots.can_fetch('https://example.com/public/pages/one')
+    assert robots.can_fetch('https://example.com/public/pages/two')
+    assert calls==['https://example.com/public/pages/one']
+
+def test_host_robots_without_parser_allows_everything():
+    robots=HostRobots(None, ttl=60)
+    assert robots.can_fetch('https://example.com/anything')
+    assert robots.crawl_delay() is None
+
+def test_process_url_fetches_robots_only_for_candidate_links(monkeypatch):
+    html='''
+        <a href="https://docs.example.com/guide">same registered domain</a>
+        <a href="https://other.org/page">off-domain page</a>
+        <a href="https://cdn.other.org/report.pdf">off-domain pdf</a>
+        <a href="https://www.example.com/about">same host</a>
+    '''
+    fetched=[]
+
+    async def fake_fetch(self, origin, session):
+        fetched.append(origin)
+        return HostRobots(None, ttl=60)
+
+    async def fake_fetch_page(url, session, controller, request_headers=None):
+        return {'status':200, 'html':html, 'etag':None, 'last_modified':None}
+
+    monkeypatch.setattr(RobotsCache, 'fetch', fake_fetch)
+    monkeypatch.setattr(domain_functions, 'fetch_page', fake_fetch_page)
+
+    async def run():
+        scheduler=CrawlScheduler(sitemap_url_set=set())
+        seed='https://www.example.com/'
+        await scheduler.process_url(None, seed, [seed], None, seed)
+        return scheduler
+
+    scheduler=asyncio.run(run())
+    assert sorted(fetched)==['https://cdn.other.org', 'https://docs.example.com', 'https://www.example.com']
+    assert [d['download_url'] for d in scheduler.downloads_info]==['https://cdn.other.org/report.pdf']
+    assert list(scheduler.pending)==['https://docs.example.com/guide']
+
+def test_check_download_changed_treats_missing_validators_as_changed(monkeypatch):
+    response=type('Response', (), {'status_code':200, 'headers':{'ETag':'"v2"'}})()
+    monkeypatch.setattr(domain_functions.requests, 'head', lambda url, **kwargs: response)
+    url='https://www.example.com/report.pdf'
+    assert domain_functions.check_download_changed(url, None)==(True, {'etag':'"v2"', 'last_modified':None})
+    assert domain_functions.check_download_changed(url, UrlMetadata(url=url))[0] is True
+    assert domain_functions.check_download_changed(url, UrlMetadata(url=url, etag='"v2"'))[0] is False
+    assert domain_functions.check_download_changed(url, UrlMetadata(url=url, etag='"v1"'))[0] is True
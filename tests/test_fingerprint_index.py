@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip('playwright')
+pytest.importorskip('fitz')
+
+from storage.fingerprint_index import FingerprintIndex
+from storage.models import KnowledgeBaseRecord
+from utils import simhash
+
+FILING_TEXT=' '.join(f'section {i} of the annual report covers revenue, risk factors and governance' for i in range(40))
+
+def make_record(url, content_hash='a'*64, page_count=120, text=FILING_TEXT):
+    return KnowledgeBaseRecord(
+          url=url
+        , url_domain='example.com'
+        , content_hash=content_hash
+        , simhash=format(simhash(text), '016x')
+        , page_count=page_count
+    )
+
+def build_index(*records):
+    index=FingerprintIndex()
+    for record in records:
+        index.add(record)
+    return index
+
+def test_exact_content_hash_is_a_duplicate():
+    original=make_record('https://example.com/a.pdf')
+    index=build_index(original)
+    assert index.find_duplicate('a'*64, None, exclude_url='https://mirror.com/a.pdf')==(original.record_id, 'content_hash')
+
+def test_simhash_match_requires_the_same_page_count():
+    original=make_record('https://example.com/2023.pdf')
+    index=build_index(original)
+    candidate=make_record('https://example.com/2024.pdf', content_hash='b'*64, page_count=131)
+    assert index.find_duplicate(candidate.content_hash, candidate.simhash, page_count=candidate.page_count) is None
+    mirror=make_record('https://mirror.com/2023.pdf', content_hash='c'*64)
+    assert index.find_duplicate(mirror.content_hash, mirror.simhash, page_count=mirror.page_count)==(original.record_id, 'simhash')
+
+def test_same_url_is_not_its_own_duplicate():
+    original=make_record('https://example.com/a.pdf')
+    index=build_index(original)
+    assert index.find_duplicate(original.content_hash, original.simhash, page_count=120, exclude_url=original.url) is None
@@ -0,0 +1,49 @@
+import pytest
+
+from html_parsing import BACKENDS, stream_extract_links, stream_segment_html, segment_html
+
+LIST_FIXTURE='<h1>Title</h1><ul><li>x<li>y</ul><p>q <b>bold</b> tail</p>'
+NESTED_FIXTURE='<h1>Title</h1><p>intro<ul><li>one</li><li><p>two</p></li></ul><h2>Next</h2><ol><li>k</ol>'
+PAGE_FIXTURE='''
+<html><head><style>p { color: red }</style><script>var a = '<p>no</p>';</script></head>
+<body>
+  <h1>Products</h1>
+  <p>Our <a href="/graph">identity graph</a> links households.</p>
+  <img src="logo.png">
+  <h2>Pricing</h2>
+  <ul><li>Starter</li><li>Enterprise <a href="https://example.com/contact">contact us</a></li></ul>
+</body></html>
+'''
+
+def test_stream_closes_list_items_implicitly():
+    sections=stream_segment_html(LIST_FIXTURE)['sections']
+    assert sections==[{'heading':'Title', 'items':['-  x', '-  y', 'q bold tail']}]
+
+@pytest.mark.parametrize('html', [LIST_FIXTURE, NESTED_FIXTURE, PAGE_FIXTURE])
+def test_stream_matches_lxml_sections(html):
+    pytest.importorskip('lxml')
+    assert BACKENDS['stream'][1](html)['sections']==BACKENDS['lxml'][1](html)['sections']
+
+@pytest.mark.parametrize('backend', ['stream', 'lxml', 'bs4'])
+def test_backends_extract_links_and_images(backend):
+    extract_links, segment=BACKENDS[backend]
+    try:
+        links=extract_links(PAGE_FIXTURE)
+        segments=segment(PAGE_FIXTURE)
+    except ImportError as e:
+        pytest.skip(f'{e.name} not installed')
+    assert links==['/graph', 'https://example.com/contact']
+    assert segments['image_present']
+    assert [s['heading'] for s in segments['sections']]==['Products', 'Pricing']
+
+def test_stream_skips_script_and_style_text():
+    text=stream_segment_html(PAGE_FIXTURE)['text']
+    assert 'color' not in text and 'var a' not in text
+    assert 'identity graph' in text
+
+def test_stream_links_without_segments():
+    assert stream_extract_links('<a href="a">x</a><a>no href</a><a href="b">y</a>')==['a', 'b']
+
+def test_unknown_backend_falls_back_to_bs4():
+    pytest.importorskip('bs4')
+    assert segment_html(LIST_FIXTURE, backend='missing')['sections'][0]['heading']=='Title'
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('playwright')
+pytest.importorskip('fitz')
+
+import web_search.pipeline as pipeline
+from web_search.pipeline import IngestionPipeline, close_pipelines
+
+class FakeKnowledgeBase:
+    def __init__(self):
+        self.batches=[]
+
+    def save_records(self, records):
+        self.batches.append([r.url for r in records])
+
+def make_record(idx):
+    return type('Record', (), {'record_id':f'r{idx}', 'url':f'https://example.com/{idx}', 'paragraph_clusters':[]})()
+
+def test_consume_commits_queued_records_in_batches(monkeypatch):
+    monkeypatch.setattr(pipeline, 'enrich_records', lambda records: None)
+    monkeypatch.setattr(pipeline, 'KB_COMMIT_BATCH_SIZE', 3)
+
+    async def run():
+        kb=FakeKnowledgeBase()
+        ingestion=IngestionPipeline(kb)
+        ingestion.producers=[None]*5
+        for idx in range(4):
+            ingestion.queue.put_nowait(make_record(idx))
+        ingestion.queue.put_nowait(None)
+        await ingestion.consume()
+        return kb, ingestion
+
+    kb, ingestion=asyncio.run(run())
+    assert kb.batches==[['https://example.com/0', 'https://example.com/1', 'https://example.com/2'], ['https://example.com/3']]
+    assert sorted(ingestion.scores)==['r0', 'r1', 'r2', 'r3']
+
+def test_close_pipelines_does_not_wait_past_the_timeout():
+    class SlowPipeline:
+        async def close(self):
+            await asyncio.sleep(0.5)
+
+    async def run():
+        await close_pipelines([SlowPipeline()], timeout=0.01)
+        leftover=set(pipeline.closing_pipelines)
+        await asyncio.gather(*leftover)
+        return leftover
+
+    leftover=asyncio.run(run())
+    assert len(leftover)==1
+    assert not pipeline.closing_pipelines
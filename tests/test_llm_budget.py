@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+import config
+from config import AsyncBudgetedTransport, BudgetedTransport
+
+@pytest.fixture
+def budget(monkeypatch):
+    semaphore=threading.BoundedSemaphore(1)
+    monkeypatch.setattr(config, 'llm_budget', semaphore)
+    return semaphore
+
+def held(semaphore) -> bool:
+    if semaphore.acquire(blocking=False):
+        semaphore.release()
+        return False
+    return True
+
+def test_sync_permit_is_held_until_the_streamed_response_closes(budget, monkeypatch):
+    monkeypatch.setattr(httpx.HTTPTransport, 'handle_request', lambda self, request: httpx.Response(200, stream=httpx.ByteStream(b'data: 1\n\n')))
+    with httpx.Client(transport=BudgetedTransport()) as http:
+        with http.stream('GET', 'https://api.example.com/v1/responses') as response:
+            assert held(budget)
+            assert next(response.iter_raw())==b'data: 1\n\n'
+            assert held(budget)
+        assert not held(budget)
+
+def test_sync_permit_is_released_when_the_request_fails(budget, monkeypatch):
+    def fail(self, request):
+        raise httpx.ConnectError('refused')
+    monkeypatch.setattr(httpx.HTTPTransport, 'handle_request', fail)
+    with httpx.Client(transport=BudgetedTransport()) as http:
+        with pytest.raises(httpx.ConnectError):
+            http.get('https://api.example.com/v1/responses')
+    assert not held(budget)
+
+def test_async_permit_is_held_until_the_streamed_response_closes(budget, monkeypatch):
+    async def handle(self, request):
+        return httpx.Response(200, stream=httpx.ByteStream(b'data: 1\n\n'))
+    monkeypatch.setattr(httpx.AsyncHTTPTransport, 'handle_async_request', handle)
+
+    async def run():
+        async with httpx.AsyncClient(transport=AsyncBudgetedTransport()) as http:
+            async with http.stream('GET', 'https://api.example.com/v1/responses') as response:
+                assert held(budget)
+                await response.aread()
+            assert not held(budget)
+
+    asyncio.run(run())
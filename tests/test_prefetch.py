@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip('playwright')
+pytest.importorskip('fitz')
+
+import retrieval.prefetch as prefetch
+from retrieval.prefetch import RetrievalPrefetcher
+
+def test_prefetch_skips_queries_superseded_before_embedding(monkeypatch):
+    embedded=[]
+    monkeypatch.setattr(prefetch, 'embed_text', lambda text: embedded.append(text) or [1.0, 0.0])
+    prefetcher=RetrievalPrefetcher('session')
+    try:
+        prefetcher.query='Target Market(s): identity resolution'
+        prefetcher.prefetch('Target Market(s): identity')
+        assert embedded==[]
+    finally:
+        prefetcher.close()
+
+def test_score_reuses_prefetched_scores_for_the_same_query():
+    cluster=type('Cluster', (), {'cluster_id':'c1', 'embedding':[1.0, 0.0]})()
+    record=type('Record', (), {'paragraph_clusters':[cluster]})()
+    prefetcher=RetrievalPrefetcher('session')
+    try:
+        prefetcher.query='q'
+        prefetcher.scores={'c1':0.25}
+        assert prefetcher.score('q', [1.0, 0.0], [record])=={'c1':0.25}
+        assert prefetcher.score('other', [1.0, 0.0], [record])=={'c1':1.0}
+        assert prefetcher.query=='other'
+    finally:
+        prefetcher.close()
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('playwright')
+pytest.importorskip('fitz')
+
+import synthesis.response_generation as response_generation
+from session_memory import SessionMemory, use_session
+from user_intent_profile.models import UserIntentProfile
+
+def delta(text):
+    return SimpleNamespace(type='response.output_text.delta', delta=text)
+
+@pytest.fixture
+def fake_stream(monkeypatch, tmp_path):
+    static=tmp_path / 'static.txt'
+    static.write_text('instructions', encoding='utf-8')
+    monkeypatch.setattr(response_generation, 'get_generation_paths', lambda profile: (static, static))
+    monkeypatch.setattr(response_generation, 'get_cluster_level_resolution', lambda: 'resolution')
+    events=[]
+    monkeypatch.setattr(response_generation.client.responses, 'create', lambda **kwargs: iter(events))
+    return events
+
+def generate(on_token=None):
+    with use_session(SessionMemory(user_intent_profile=UserIntentProfile())):
+        return response_generation.run_response_generation(streaming=True, on_token=on_token)
+
+def test_completed_stream_returns_the_full_answer(fake_stream):
+    fake_stream.extend([delta('Hello '), delta('world'), SimpleNamespace(type='response.completed')])
+    tokens=[]
+    assert generate(on_token=tokens.append)=='Hello world'
+    assert tokens==['Hello ', 'world']
+
+@pytest.mark.parametrize('terminal', ['response.failed', 'response.incomplete', 'error', None])
+def test_unfinished_stream_is_not_reported_as_an_answer(fake_stream, terminal):
+    fake_stream.append(delta('partial'))
+    if terminal:
+        fake_stream.append(SimpleNamespace(type=terminal))
+    assert generate() is None
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import run_waiter
+
+class DroppedStream:
+    def __enter__(self):
+        raise ConnectionError('stream dropped')
+
+    def __exit__(self, *exc):
+        return False
+
+class FakeRuns:
+    def __init__(self, listed):
+        self.listed=listed
+        self.created=[]
+
+    def stream(self, **kwargs):
+        return DroppedStream()
+
+    def list(self, **kwargs):
+        return SimpleNamespace(data=self.listed)
+
+    def create(self, **kwargs):
+        run=SimpleNamespace(id='run-new', assistant_id=kwargs['assistant_id'], status='queued')
+        self.created.append(run)
+        return run
+
+    def retrieve(self, thread_id, run_id):
+        return SimpleNamespace(id=run_id, status='completed')
+
+def patch_runs(monkeypatch, listed):
+    runs=FakeRuns(listed)
+    monkeypatch.setattr(run_waiter, 'client', SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs))))
+    return runs
+
+def test_run_and_wait_resumes_a_run_created_by_the_failed_stream(monkeypatch):
+    runs=patch_runs(monkeypatch, [SimpleNamespace(id='run-1', assistant_id='asst', status='in_progress')])
+    run=run_waiter.run_and_wait('thread', 'asst')
+    assert run.id=='run-1'
+    assert runs.created==[]
+
+def test_run_and_wait_creates_a_run_when_none_is_active(monkeypatch):
+    runs=patch_runs(monkeypatch, [
+          SimpleNamespace(id='run-0', assistant_id='asst', status='completed')
+        , SimpleNamespace(id='run-x', assistant_id='other', status='in_progress')
+    ])
+    run=run_waiter.run_and_wait('thread', 'asst')
+    assert run.id=='run-new'
+    assert len(runs.created)==1
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('serpapi')
+pytest.importorskip('playwright')
+pytest.importorskip('fitz')
+
+import run_agent
+from session_memory import SessionMemory
+from storage.session_checkpoints import SessionCheckpoint, SessionCheckpointStore
+from user_intent_profile.models import UserIntentProfile
+
+@pytest.fixture
+def checkpoint_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('session_checkpoint_dir', str(tmp_path))
+    return tmp_path
+
+@pytest.fixture
+def stages(monkeypatch):
+    calls=[]
+    state={'search_failures':0, 'cluster_failures':0}
+
+    async def fake_search(fan_out=False, in_flight_urls=None):
+        calls.append('search')
+        if state['search_failures']:
+            state['search_failures']-=1
+            raise RuntimeError('search failed')
+        class Pipeline:
+            urls=set()
+            done=True
+            async def close(self):
+                pass
+        return Pipeline()
+
+    def cluster_decision():
+        calls.append('cluster_decision')
+        if state['cluster_failures']:
+            state['cluster_failures']-=1
+            raise RuntimeError('cluster decision failed')
+        return {'fallback_to_web_search':False, 'rationale':'enough context'}
+
+    monkeypatch.setattr(run_agent, 'get_record_level_decision', lambda: calls.append('record_decision') or {'fallback_to_web_search':True, 'rationale':'kb is thin'})
+    monkeypatch.setattr(run_agent, 'perform_web_search', fake_search)
+    monkeypatch.setattr(run_agent, 'record_level_rag', lambda: calls.append('record_rag') or ['record-1'])
+    monkeypatch.setattr(run_agent, 'cluster_level_rag', lambda ids: calls.append('cluster_rag'))
+    monkeypatch.setattr(run_agent, 'get_cluster_level_decision', cluster_decision)
+    monkeypatch.setattr(run_agent, 'run_response_generation', lambda on_token=None: calls.append('answer') or 'answer')
+    return calls, state
+
+def test_checkpoint_round_trip(checkpoint_dir):
+    memory=SessionMemory()
+    memory.save_session_records(['record-1'])
+    checkpoint=SessionCheckpoint(
+          session_id=memory.session_id
+        , stage='record_decided'
+        , memory=memory.model_dump()
+        , record_level_decision={'fallback_to_web_search':True}
+        , selected_record_ids=['record-1']
+    )
+    store=SessionCheckpointStore(memory.session_id, checkpoint_dir=checkpoint_dir / 'explicit')
+    store.save(checkpoint)
+    assert store.path.parent==checkpoint_dir / 'explicit'
+    assert SessionCheckpointStore(memory.session_id).path.parent==checkpoint_dir
+    loaded=store.load()
+    assert loaded.model_dump()==checkpoint.model_dump()
+    assert SessionMemory(**loaded.memory).session_records==['record-1']
+    store.clear()
+    assert store.load() is None
+
+def test_resume_after_interrupted_search_reruns_the_search(checkpoint_dir, stages):
+    calls, state=stages
+    state['search_failures']=1
+    memory=SessionMemory()
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_agent.run_agent(profile=UserIntentProfile(), session=memory))
+    assert calls==['record_decision', 'search']
+    assert SessionCheckpointStore(memory.session_id).load().stage=='record_decided'
+    calls.clear()
+    assert asyncio.run(run_agent.resume_agent(memory.session_id))=='answer'
+    assert calls==['search', 'record_rag', 'cluster_rag', 'cluster_decision', 'answer']
+    assert SessionCheckpointStore(memory.session_id).load() is None
+
+def test_resume_skips_completed_stages(checkpoint_dir, stages):
+    calls, state=stages
+    state['cluster_failures']=1
+    memory=SessionMemory()
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_agent.run_agent(profile=UserIntentProfile(), session=memory))
+    assert SessionCheckpointStore(memory.session_id).load().stage=='clusters_selected'
+    calls.clear()
+    assert asyncio.run(run_agent.resume_agent(memory.session_id))=='answer'
+    assert calls==['cluster_decision', 'answer']
+
+def test_resume_without_checkpoint_raises(checkpoint_dir):
+    with pytest.raises(ValueError):
+        asyncio.run(run_agent.resume_agent('missing-session'))
@@ -0,0 +1,67 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import storage.upload_registry as upload_registry
+from storage.upload_registry import UploadRegistry
+
+class FakeFiles:
+    def __init__(self):
+        self.created=[]
+        self.retrieved=[]
+        self.lock=threading.Lock()
+
+    def create(self, file, purpose):
+        time.sleep(0.05)
+        with self.lock:
+            file_id=f'file-{len(self.created)}'
+            self.created.append(file_id)
+        return SimpleNamespace(id=file_id)
+
+    def retrieve(self, file_id):
+        self.retrieved.append(file_id)
+        if file_id not in self.created:
+            raise LookupError(file_id)
+        return SimpleNamespace(id=file_id)
+
+    def delete(self, file_id):
+        self.created.remove(file_id)
+
+@pytest.fixture
+def files(monkeypatch):
+    monkeypatch.setattr(upload_registry, 'VALIDATED_UPLOADS', {})
+    return FakeFiles()
+
+def test_concurrent_lookups_of_the_same_file_upload_once(tmp_path, files):
+    static_file=tmp_path / 'customer.txt'
+    static_file.write_text('customer profile')
+    registry_path=tmp_path / 'upload_registry.json'
+    client=SimpleNamespace(files=files)
+    file_ids=[]
+
+    def lookup():
+        file_ids.append(UploadRegistry(client, path=registry_path).get_file_id(static_file))
+
+    threads=[threading.Thread(target=lookup) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert files.created==['file-0']
+    assert file_ids==['file-0']*4
+
+def test_validated_handles_are_not_retrieved_again_within_the_ttl(tmp_path, files, monkeypatch):
+    static_file=tmp_path / 'customer.txt'
+    static_file.write_text('customer profile')
+    registry_path=tmp_path / 'upload_registry.json'
+    client=SimpleNamespace(files=files)
+    UploadRegistry(client, path=registry_path).get_file_id(static_file)
+    upload_registry.VALIDATED_UPLOADS.clear()
+    for _ in range(3):
+        assert UploadRegistry(client, path=registry_path).get_file_id(static_file)=='file-0'
+    assert files.retrieved==['file-0']
+    monkeypatch.setattr(upload_registry, 'UPLOAD_VALIDATION_TTL', 0.0)
+    UploadRegistry(client, path=registry_path).get_file_id(static_file)
+    assert files.retrieved==['file-0', 'file-0']
@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip('serpapi')
+pytest.importorskip('playwright')
+pytest.importorskip('fitz')
+
+from web_search.functions import merge_organic_results, normalize_result_url
+
+def test_normalize_result_url_ignores_scheme_www_case_and_trailing_slash():
+    assert normalize_result_url('https://WWW.Example.com/Report/')=='example.com/Report'
+    assert normalize_result_url('http://example.com/Report')=='example.com/Report'
+    assert normalize_result_url('https://example.com/search?q=1')=='example.com/search?q=1'
+
+def test_merge_organic_results_keeps_first_occurrence_in_query_order():
+    result_sets=[
+          {'organic_results':[{'link':'https://www.example.com/a/', 'position':1}, {'link':'https://example.com/b'}]}
+        , {'organic_results':[{'link':'http://example.com/a', 'position':2}, {'link':'https://other.com/c'}, {'title':'no link'}]}
+        , {}
+    ]
+    merged=merge_organic_results(result_sets)
+    assert [r['link'] for r in merged]==['https://www.example.com/a/', 'https://example.com/b', 'https://other.com/c']
+    assert merged[0]['position']==1
+
+def test_merge_organic_results_distinguishes_query_strings():
+    merged=merge_organic_results([{'organic_results':[{'link':'https://example.com/p?id=1'}, {'link':'https://example.com/p?id=2'}]}])
+    assert len(merged)==2
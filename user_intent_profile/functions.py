@@ -1,18 +1,14 @@
 import json
-import time
 from config import client
 from utils import logger
+from run_waiter import wait_for_run, submit_tool_outputs_and_wait, RUN_WAIT_TIMEOUT
 from user_intent_profile.models import UserIntentProfile, ResearchFocus, TargetCompany
 
 def get_run_status(thread_id: str, run_id: str):
     return client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
 
-def wait_for_run_completion(thread_id: str, run_id: str, time_interval: float=0.5):
-    while True:
-        run_status=get_run_status(thread_id, run_id)
-        if run_status.status in ['completed', 'failed', 'cancelled', 'expired', 'requires_action']:
-            return run_status
-        time.sleep(time_interval)
+def wait_for_run_completion(thread_id: str, run_id: str, timeout: float=RUN_WAIT_TIMEOUT):
+    return wait_for_run(thread_id, run_id, timeout)
 
 def apply_tool_call_to_profile(profile: UserIntentProfile, tool_name: str, args_json: str) -> None:
     args = json.loads(args_json)
@@ -67,7 +63,7 @@ def apply_tool_call_to_profile(profile: UserIntentProfile, tool_name: str, args_
             profile.log_tool_call(tool_name=tool_name, args=str(args['business_use_case']))
             match.business_use_case=args['business_use_case']
 
-def process_tool_calls(thread_id: str, run_id: str, profile: UserIntentProfile, run_status):
+def process_tool_calls(thread_id: str, run_id: str, profile: UserIntentProfile, run_status, prefetcher=None):
     tool_calls=run_status.required_action.submit_tool_outputs.tool_calls
     tool_outputs=[]
     for call in tool_calls:
@@ -75,13 +71,16 @@ def process_tool_calls(thread_id: str, run_id: str, profile: UserIntentProfile,
         args_json=call.function.arguments
         call_id=call.id
         apply_tool_call_to_profile(profile, tool_name, args_json)
+        if prefetcher:
+            prefetcher.notify(profile, tool_name)
         tool_outputs.append({
               'tool_call_id':call_id
             , 'output':'OK'
         })
     if tool_outputs:
-        client.beta.threads.runs.submit_tool_outputs(
+        return submit_tool_outputs_and_wait(
               thread_id=thread_id
             , run_id=run_id
             , tool_outputs=tool_outputs
-        )
\ No newline at end of file
+        )
+    return wait_for_run_completion(thread_id, run_id)
\ No newline at end of file
@@ -1,77 +1,82 @@
 import json
-from session_memory import session_memory
+from typing import Optional
+from session_memory import session_memory, get_session_memory
 from config import client, uip_id
 from utils import logger
 from user_intent_profile.models import UserIntentProfile
-from user_intent_profile.functions import wait_for_run_completion, process_tool_calls
+from user_intent_profile.functions import process_tool_calls
+from run_waiter import run_and_wait
+from retrieval.prefetch import register_prefetcher
 
-def run_user_intent_loop():
-    profile=UserIntentProfile()
-    profile.mark_start()
-    thread_id = client.beta.threads.create().id
-    first_agent_msg="Hello! I'm here to help you conduct a competitive analysis. Can you tell me about what you're looking for as well as what your role is at Claritas?"
-    print(f"Agent:\n{first_agent_msg}")
-
-    last_agent_msg=first_agent_msg
-    last_tool_used=None
-    updated_fields=[]
-    pending_tool_followup=False
+FIRST_AGENT_MSG="Hello! I'm here to help you conduct a competitive analysis. Can you tell me about what you're looking for as well as what your role is at Claritas?"
 
-    while not profile.system_workflow.is_profile_complete:
-        if not pending_tool_followup:
-            user_input=input('You:\n').strip()
-            if not user_input:
-                continue
-            if user_input.lower()=='exit':
-                break
+class IntentClarifier:
+    def __init__(self, session_id: Optional[str]=None):
+        self.prefetcher=register_prefetcher(session_id) if session_id else None
+        self.profile=UserIntentProfile()
+        self.profile.mark_start()
+        self.thread_id=client.beta.threads.create().id
+        self.last_agent_msg=FIRST_AGENT_MSG
+        self.last_tool_used=None
+        self.updated_fields=[]
 
-            clarification_prompt=profile.build_agent_prompt(
-                  user_input=user_input
-                , last_agent_msg=last_agent_msg
-                , last_tool=last_tool_used
-                , updated_fields=updated_fields
-            )
-            client.beta.threads.messages.create(
-                  thread_id=thread_id
-                , role='user'
-                , content=clarification_prompt
-            )
-            profile.log_conversation_turn(speaker='user', message=user_input)
-            updated_fields.clear()
-            last_tool_used=None
+    @property
+    def is_complete(self) -> bool:
+        return self.profile.system_workflow.is_profile_complete
 
-        run=client.beta.threads.runs.create(
-              thread_id=thread_id
-            , assistant_id=uip_id
+    def submit_turn(self, user_input: str) -> Optional[str]:
+        clarification_prompt=self.profile.build_agent_prompt(
+              user_input=user_input
+            , last_agent_msg=self.last_agent_msg
+            , last_tool=self.last_tool_used
+            , updated_fields=self.updated_fields
+        )
+        client.beta.threads.messages.create(
+              thread_id=self.thread_id
+            , role='user'
+            , content=clarification_prompt
         )
-        run_status=wait_for_run_completion(thread_id,run.id)
+        self.profile.log_conversation_turn(speaker='user', message=user_input)
+        self.updated_fields.clear()
+        self.last_tool_used=None
 
-        if run_status.status=='requires_action':
-            while run_status.status=='requires_action':
-                tool_calls=run_status.required_action.submit_tool_outputs.tool_calls
-                for call in tool_calls:
-                    tool_name=call.function.name
-                    args_json=call.function.arguments
-                    last_tool_used=tool_name
-                    args_dict=json.loads(args_json)
-                    updated_fields.extend(args_dict.keys())
-                process_tool_calls(thread_id, run.id, profile, run_status)
-                run_status=wait_for_run_completion(thread_id, run.id)
+        while True:
+            run_status=run_and_wait(self.thread_id, uip_id)
+            if run_status.status=='requires_action':
+                while run_status.status=='requires_action':
+                    tool_calls=run_status.required_action.submit_tool_outputs.tool_calls
+                    for call in tool_calls:
+                        self.last_tool_used=call.function.name
+                        self.updated_fields.extend(json.loads(call.function.arguments).keys())
+                    run_status=process_tool_calls(self.thread_id, run_status.id, self.profile, run_status, prefetcher=self.prefetcher)
+                self.profile.post_state_to_thread(self.thread_id)
+                if self.is_complete:
+                    return None
+                continue
+            elif run_status.status=='completed':
+                messages=client.beta.threads.messages.list(thread_id=self.thread_id)
+                for msg in messages.data:
+                    if msg.run_id==run_status.id and msg.role=='assistant':
+                        self.last_agent_msg=msg.content[0].text.value
+                        self.profile.log_conversation_turn(speaker='agent',message=self.last_agent_msg)
+                        return self.last_agent_msg
+                return None
+            else:
+                raise RuntimeError(f"Unexpected run status: '{run_status.status}'")
+
+def run_user_intent_loop():
+    clarifier=IntentClarifier(session_id=get_session_memory().session_id)
+    print(f"Agent:\n{FIRST_AGENT_MSG}")
 
-            profile.post_state_to_thread(thread_id)
-            pending_tool_followup=True
+    while not clarifier.is_complete:
+        user_input=input('You:\n').strip()
+        if not user_input:
             continue
-        elif run_status.status=='completed':
-            messages=client.beta.threads.messages.list(thread_id=thread_id)
-            for msg in messages.data:
-                if msg.run_id==run.id and msg.role=='assistant':
-                    last_agent_msg=msg.content[0].text.value
-                    print(f'Agent:\n{last_agent_msg}')
-                    profile.log_conversation_turn(speaker='agent',message=last_agent_msg)
-                    pending_tool_followup=False
-                    break
-        else:
-            raise RuntimeError(f"Unexpected run status: '{run_status.status}'")
+        if user_input.lower()=='exit':
+            break
+        agent_msg=clarifier.submit_turn(user_input)
+        if agent_msg:
+            print(f'Agent:\n{agent_msg}')
     print("\n[Complete] User intent clarification finalized.\n")
-    session_memory.save_user_intent_profile(profile)
-    return profile
\ No newline at end of file
+    session_memory.save_user_intent_profile(clarifier.profile)
+    return clarifier.profile
@@ -1,7 +1,10 @@
 import logging
-from typing import List, Dict, Any, Generator
+from typing import List, Dict, Any, Generator, Tuple
+from functools import lru_cache
 from config import client
 import numpy as np
+import hashlib
+import re
 
 logging.basicConfig(
       level=logging.INFO
@@ -13,13 +16,19 @@ logger = logging.getLogger('utils')
 logging.getLogger('httpx').setLevel(logging.WARNING)
 logging.getLogger('openai').setLevel(logging.WARNING)
 
+EMBEDDING_CACHE_SIZE=4096
+
+@lru_cache(maxsize=EMBEDDING_CACHE_SIZE)
+def cached_embedding(text: str) -> Tuple[float, ...]:
+    response = client.embeddings.create(
+          model = 'text-embedding-ada-002'
+        , input = text
+    )
+    return tuple(response.data[0].embedding)
+
 def embed_text(text: str) -> List[float]:
     try:
-        response = client.embeddings.create(
-              model = 'text-embedding-ada-002'
-            , input = text
-        )
-        return response.data[0].embedding
+        return list(cached_embedding(text))
     except Exception as e:
         logger.error(f'Failed to embed text: {e}')
 
@@ -32,4 +41,19 @@ def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
 
 def batch_items(items: List[Dict[str, Any]], batch_size: int=10) -> Generator[List[Any], None, None]:
     for i in range(0, len(items), batch_size):
-        yield items[i:i + batch_size]
\ No newline at end of file
+        yield items[i:i + batch_size]
+
+def simhash(text: str, shingle_size: int=3, bits: int=64) -> int:
+    words=re.findall(r'\w+', text.lower())
+    if len(words) < shingle_size:
+        words=words+['']*(shingle_size-len(words))
+    weights=[0]*bits
+    for i in range(len(words)-shingle_size+1):
+        shingle=' '.join(words[i:i+shingle_size])
+        h=int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=bits // 8).digest(), 'big')
+        for bit in range(bits):
+            weights[bit]+=1 if (h >> bit) & 1 else -1
+    return sum(1 << bit for bit in range(bits) if weights[bit] > 0)
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
\ No newline at end of file
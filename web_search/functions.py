@@ -2,16 +2,21 @@ from storage.models import KnowledgeBaseRecord, ParagraphCluster, ExtractedFact,
 from session_memory import session_memory
 from config import client, SerpAPI_key
 from utils import logger
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from serpapi import GoogleSearch
 from datetime import datetime, time
 from urllib.parse import urlparse
 from dateutil import parser
 
+import os
+import asyncio
 import requests
 import json
 
-def get_search_query() -> Optional[str]:
+SEARCH_FAN_OUT=os.getenv('web_search_fan_out', 'false').lower()=='true'
+SEARCH_FAN_OUT_MAX_QUERIES=5
+
+def build_search_context() -> Optional[str]:
     user_intent_profile = session_memory.load_user_intent_profile()
     fallback_rationale = session_memory.load_fallback_rationale() or []
     previous_searches = session_memory.load_previous_searches() or []
@@ -46,6 +51,12 @@ def get_search_query() -> Optional[str]:
     Previous Search(es):
     {searches_str}
     """
+    return profile
+
+def get_search_query() -> Optional[str]:
+    profile = build_search_context()
+    if not profile:
+        return None
     try:
         response = client.responses.create(
               model='gpt-4.1',
@@ -75,8 +86,64 @@ def get_search_query() -> Optional[str]:
         logger.error(f"Failed to generate search query: {e}")
         return None
 
-def run_web_search() -> Dict:
-    query=get_search_query()
+def get_search_queries(max_queries: int=SEARCH_FAN_OUT_MAX_QUERIES) -> List[str]:
+    profile = build_search_context()
+    if not profile:
+        return []
+    try:
+        response = client.responses.create(
+              model='gpt-4.1',
+              input=profile,
+              instructions=f"""
+                You are a research assistant specializing in crafting high-precision Google search queries.
+                You will receive:
+                    - A list of target companies
+                    - A list of product markets or solution areas
+                    - A list of specific functional capabilities to evaluate
+                    - A rationale explaining what information is still missing (use this as your primary guidance)
+                    - A list of previous search queries already attempted
+                Your task:
+                    - Identify each distinct gap described in the latest rationale (for example, one per missing company or missing content type).
+                    - Generate one short, natural-sounding Google search query per gap, up to {max_queries} queries.
+                    - Each query must target a different gap. Do not generate near-duplicate queries.
+                    - Emphasize comparative insight, product capabilities, or detailed solution descriptions that align with the user’s research goal.
+                    - If possible, include a site constraint for the missing company's official domain (e.g., site:company.com).
+                    - Avoid repeating any previously attempted query.
+                    - Do not include years or date ranges unless explicitly instructed.
+                """,
+              text={
+                'format': {
+                    'type': 'json_schema',
+                    'name': 'search_queries',
+                    'schema': {
+                        'type': 'object',
+                        'properties': {
+                            'queries': {
+                                'type': 'array',
+                                'items': {'type': 'string'}
+                            }
+                        },
+                        'required': ['queries'],
+                        'additionalProperties': False
+                    },
+                    'strict': True
+                }
+            }
+        )
+        queries = json.loads(response.output[0].content[0].text)['queries']
+    except Exception as e:
+        logger.error(f"Failed to generate search queries: {e}")
+        return []
+    unique_queries = []
+    seen = set()
+    for query in queries:
+        key = ' '.join(query.lower().split())
+        if key and key not in seen:
+            seen.add(key)
+            unique_queries.append(query.strip())
+    return unique_queries[:max_queries]
+
+def run_search_query(query: str) -> Dict:
     params = {
         "q": query,
         "engine": "google",
@@ -87,6 +154,45 @@ def run_web_search() -> Dict:
     session_memory.save_previous_searches(query)
     return search.get_dict()
 
+def run_web_search() -> Dict:
+    return run_search_query(get_search_query())
+
+async def run_web_searches(queries: List[str]) -> List[Dict]:
+    results = await asyncio.gather(*(asyncio.to_thread(run_search_query, q) for q in queries), return_exceptions=True)
+    result_sets = []
+    for query, result in zip(queries, results):
+        if isinstance(result, Exception):
+            logger.error(f"Search failed for query '{query}': {result}")
+            continue
+        result_sets.append(result)
+    return result_sets
+
+def normalize_result_url(url: str) -> str:
+    parsed = urlparse(url)
+    netloc = parsed.netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    return f"{netloc}{parsed.path.rstrip('/')}{'?' + parsed.query if parsed.query else ''}"
+
+def merge_organic_results(result_sets: List[Dict]) -> List[Dict]:
+    merged = []
+    seen = set()
+    duplicates = 0
+    for result_set in result_sets:
+        for result in result_set.get('organic_results', []):
+            url = result.get('link')
+            if not url:
+                continue
+            key = normalize_result_url(url)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            merged.append(result)
+    if duplicates:
+        logger.info(f"Dropped {duplicates} duplicate result URL(s) across {len(result_sets)} searches.")
+    return merged
+
 def get_approved_domains():
     profile=session_memory.load_user_intent_profile()
     if not profile:
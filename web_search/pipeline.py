@@ -0,0 +1,152 @@
+from utils import logger, embed_text, cosine_similarity
+from storage.models import KnowledgeBaseRecord
+from storage.knowledge_base import KnowledgeBase, KB_COMMIT_BATCH_SIZE
+from storage.enrichment import enrich_records
+from web_search.functions import build_kb_record
+from session_memory import session_memory
+from typing import Dict, List, Optional, Set
+from playwright.async_api import async_playwright
+
+import asyncio
+import time
+
+WEB_SEARCH_INGEST_CONCURRENCY = 8
+INGEST_DEADLINE_SECONDS = 45
+INGEST_SUFFICIENT_RECORDS = 5
+INGEST_SUFFICIENT_SIMILARITY = 0.45
+PIPELINE_CLOSE_TIMEOUT = 5.0
+
+closing_pipelines: Set[asyncio.Task] = set()
+
+async def ingest_result(result: Dict, browser, semaphore: asyncio.Semaphore) -> Optional[KnowledgeBaseRecord]:
+    async with semaphore:
+        url = result.get('link')
+        record = await asyncio.to_thread(build_kb_record, result)
+        if not record:
+            logger.error(f"Failed to build record for url: '{url}'")
+            return None
+        try:
+            if record.source_type == 'html':
+                await record.run_html_extraction(browser)
+            elif record.source_type == 'pdf':
+                await asyncio.to_thread(record.run_pdf_extraction)
+            else:
+                logger.warning(f"Skipping: '{url}' is an unsupported source type: {record.source_type}")
+                return None
+        except Exception as e:
+            logger.error(f"Failed to extract url ('{url}'): {e}")
+            return None
+        return record
+
+class IngestionPipeline:
+    def __init__(self, kb: KnowledgeBase, concurrency: int = WEB_SEARCH_INGEST_CONCURRENCY):
+        self.kb = kb
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.ready = asyncio.Event()
+        self.urls: Set[str] = set()
+        self.scores: Dict[str, float] = {}
+        self.producers: List[asyncio.Task] = []
+        self.consumer: Optional[asyncio.Task] = None
+        self.profile_embedding: Optional[List[float]] = None
+        self.playwright = None
+        self.browser = None
+        self.started_at = time.perf_counter()
+
+    @property
+    def done(self) -> bool:
+        return self.consumer is None or self.consumer.done()
+
+    @property
+    def sufficient_count(self) -> int:
+        return sum(1 for score in self.scores.values() if score >= INGEST_SUFFICIENT_SIMILARITY)
+
+    async def start(self, results: List[Dict]) -> None:
+        self.urls = {r.get('link') for r in results}
+        if not results:
+            self.ready.set()
+            return
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=True)
+        profile_query = session_memory.load_profile_query()
+        if profile_query:
+            self.profile_embedding = await asyncio.to_thread(embed_text, profile_query)
+        self.producers = [asyncio.create_task(self.produce(result)) for result in results]
+        self.consumer = asyncio.create_task(self.consume())
+
+    async def produce(self, result: Dict) -> None:
+        record = None
+        try:
+            record = await ingest_result(result, self.browser, self.semaphore)
+        finally:
+            await self.queue.put(record)
+
+    async def consume(self) -> None:
+        try:
+            remaining = len(self.producers)
+            while remaining:
+                batch = [await self.queue.get()]
+                while len(batch) < KB_COMMIT_BATCH_SIZE and not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                remaining -= len(batch)
+                records = [record for record in batch if record]
+                if not records:
+                    continue
+                try:
+                    await asyncio.to_thread(self.commit, records)
+                except Exception as e:
+                    logger.error(f"Failed to commit {len(records)} record(s) ({', '.join(r.url for r in records)}): {e}")
+                    continue
+                if self.sufficient_count >= INGEST_SUFFICIENT_RECORDS and not self.ready.is_set():
+                    logger.info(f"Sufficiency reached with {self.sufficient_count} relevant record(s).")
+                    self.ready.set()
+        finally:
+            self.ready.set()
+            elapsed = time.perf_counter() - self.started_at
+            logger.info(f"Ingestion pipeline finished: {len(self.scores)} record(s) saved in {elapsed:.2f} seconds.")
+
+    def commit(self, records: List[KnowledgeBaseRecord]) -> None:
+        enrich_records(records)
+        self.kb.save_records(records)
+        session_memory.save_session_records(record_ids=[r.record_id for r in records])
+        for record in records:
+            self.scores[record.record_id] = self.score(record)
+            logger.info(f"Committed '{record.url}' (similarity {self.scores[record.record_id]:.3f}).")
+
+    def score(self, record: KnowledgeBaseRecord) -> float:
+        if not self.profile_embedding or not record.paragraph_clusters:
+            return 0.0
+        similarities = [cosine_similarity(self.profile_embedding, c.embedding) for c in record.paragraph_clusters]
+        return sum(similarities) / len(similarities)
+
+    async def wait_until_ready(self, deadline: float = INGEST_DEADLINE_SECONDS) -> None:
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout=deadline)
+        except asyncio.TimeoutError:
+            logger.info(f"Ingestion deadline of {deadline}s reached.")
+        pending = sum(1 for task in self.producers if not task.done())
+        logger.info(f"Proceeding to retrieval with {len(self.scores)} committed record(s); {pending} still ingesting in the background.")
+
+    async def close(self) -> None:
+        if self.consumer:
+            await self.consumer
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+def pipeline_closed(task: asyncio.Task) -> None:
+    closing_pipelines.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error(f"Failed to close ingestion pipeline: {task.exception()}")
+
+async def close_pipelines(pipelines: List[IngestionPipeline], timeout: float = PIPELINE_CLOSE_TIMEOUT) -> None:
+    if not pipelines:
+        return
+    tasks = [asyncio.create_task(p.close()) for p in pipelines]
+    closing_pipelines.update(tasks)
+    for task in tasks:
+        task.add_done_callback(pipeline_closed)
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    if pending:
+        logger.info(f"{len(pending)} ingestion pipeline(s) still committing after {timeout}s; leaving them to finish in the background.")